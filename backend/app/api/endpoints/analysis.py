@@ -3,6 +3,7 @@ Endpoints for time series analysis with caching
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Dict, Any, Optional
+import os
 import pandas as pd
 from app.services.data.data_service import DataService
 from app.services.analysis.time_series_analysis import TimeSeriesAnalyzer
@@ -15,6 +16,18 @@ from statsmodels.tsa.seasonal import seasonal_decompose
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Полный анализ зависит только от содержимого файла, поэтому хранится дольше обычного
+FULL_ANALYSIS_TTL = 24 * 3600
+
+
+def _file_fingerprint(file_path: str) -> Dict[str, int]:
+    """
+    Lightweight fingerprint of a dataset file for cache keys
+    """
+    stat = os.stat(file_path)
+    return {"file_mtime": stat.st_mtime_ns, "file_size": stat.st_size}
+
+
 @router.get("/stats/{dataset_id}")
 async def get_time_series_statistics(
     dataset_id: str,
@@ -27,11 +40,20 @@ async def get_time_series_statistics(
     Get statistical analysis of time series data
     """
     try:
-        # Параметры для кеша
+        # Получаем информацию о датасете
+        data_service = DataService(db)
+        dataset = data_service.get_dataset(dataset_id)
+        
+        if not dataset:
+            raise HTTPException(status_code=404, detail=f"Датасет с ID {dataset_id} не найден")
+        
+        # Параметры для кеша: время изменения и размер файла инвалидируют
+        # результат, если файл датасета был перезаписан
         cache_params = {
             "dataset_id": dataset_id,
             "date_column": date_column,
-            "value_column": value_column
+            "value_column": value_column,
+            **_file_fingerprint(dataset.file_path)
         }
         
         # Проверяем кеш, если не требуется принудительное обновление
@@ -41,13 +63,6 @@ async def get_time_series_statistics(
                 logger.info(f"Retrieved cached stats for dataset {dataset_id}")
                 return cached_result
         
-        # Получаем информацию о датасете
-        data_service = DataService(db)
-        dataset = data_service.get_dataset(dataset_id)
-        
-        if not dataset:
-            raise HTTPException(status_code=404, detail=f"Датасет с ID {dataset_id} не найден")
-        
         # Загружаем данные
         df = pd.read_csv(dataset.file_path)
         
@@ -62,7 +77,7 @@ async def get_time_series_statistics(
         analysis_results = analyzer.get_full_analysis()
         
         # Кешируем результаты
-        cache.set("stats", cache_params, analysis_results)
+        cache.set("stats", cache_params, analysis_results, ttl=FULL_ANALYSIS_TTL)
         
         return analysis_results
     
@@ -78,6 +93,7 @@ async def get_anomalies(
     date_column: str = Query(..., description="Имя столбца с датами"),
     value_column: str = Query(..., description="Имя столбца со значениями"),
     threshold: float = Query(3.0, description="Порог Z-score для определения аномалий"),
+    method: str = Query("modified", pattern="^(modified|zscore)$", description="Метод: modified (медиана и MAD) или zscore (среднее и отклонение)"),
     force_refresh: bool = Query(False, description="Принудительное обновление кеша"),
     db: Session = Depends(get_db)
 ):
@@ -90,7 +106,8 @@ async def get_anomalies(
             "dataset_id": dataset_id,
             "date_column": date_column,
             "value_column": value_column,
-            "threshold": threshold
+            "threshold": threshold,
+            "method": method
         }
         
         # Проверяем кеш
@@ -118,7 +135,7 @@ async def get_anomalies(
         
         # Создаем анализатор и получаем аномалии
         analyzer = TimeSeriesAnalyzer(df, date_column, value_column)
-        anomalies = analyzer.detect_anomalies(threshold)
+        anomalies = analyzer.detect_anomalies(threshold, method)
         
         result = {
             "anomalies": anomalies,
@@ -4,7 +4,6 @@ from typing import List, Dict, Any, Optional
 import pandas as pd
 import os
 import uuid
-import json
 import logging
 import traceback  # Для подробного логирования ошибок
 from app.models.data import DataResponse, DataAnalysisRequest, DataAnalysisResponse, ColumnSelection
@@ -224,7 +223,7 @@ async def upload_data(
         logger.info(f"Файл успешно загружен и обработан, присвоен ID: {dataset.id}")
         return JSONResponse(
             status_code=200,
-            content=response.dict(),
+            content=response.model_dump(),
             headers={
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "POST, OPTIONS",
@@ -271,7 +270,7 @@ async def analyze_data(
             task_type="analysis",
             params={
                 "dataset_id": request.dataset_id,
-                "columns": request.columns.dict(),
+                "columns": request.columns.model_dump(),
                 "analysis_type": request.analysis_type,
                 "params": request.params
             }
@@ -305,9 +304,7 @@ async def get_columns(
         if not dataset:
             raise HTTPException(status_code=404, detail=f"Датасет с ID {dataset_id} не найден")
         
-        # Получаем список колонок из JSON строки
-        columns = json.loads(dataset.feature_columns)
-        return columns
+        return dataset.feature_columns
     
     except HTTPException:
         raise
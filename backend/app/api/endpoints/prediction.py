@@ -22,16 +22,13 @@ async def predict(
         # Подготавливаем параметры задачи
         task_params = prepare_prediction_task(request.params)
         
-        # Добавляем задачу в очередь
-        task_id = queue.add_task(
+        # Добавляем задачу в очередь и сразу получаем ее позицию
+        task_id, position = queue.enqueue_task(
             user_id=request.user_id,
             task_type="prediction",
             params=task_params
         )
         
-        # Получаем позицию в очереди
-        position = queue.get_position(task_id)
-        
         # Оцениваем время выполнения (условно)
         estimated_time = 30  # Прогнозирование обычно быстрее обучения
         
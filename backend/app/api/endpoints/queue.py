@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from typing import List, Optional
 import logging
-from app.models.queue import TaskStatus, QueueInfo, TaskLog
-from app.core.queue import JobQueue
+from app.models.queue import TaskStatus, QueueInfo, TaskLog, dump_task_logs
+from app.core.queue import JobQueue, LOG_MAX_ENTRIES, TASK_PAGE_SIZE
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -22,8 +22,8 @@ async def get_task_status(
         if not task:
             raise HTTPException(status_code=404, detail=f"Задача с ID {task_id} не найдена")
         
-        # Получаем позицию в очереди
-        position = queue.get_position(task_id)
+        # Получаем позицию в очереди (Redis запрашивается только для ожидающих задач)
+        position = queue.get_position(task_id, task)
         
         # Формируем ответ с учетом новых полей
         return TaskStatus(
@@ -49,22 +49,25 @@ async def get_task_status(
 
 @router.get("/info", response_model=QueueInfo)
 async def get_queue_info(
+    limit: int = Query(TASK_PAGE_SIZE, ge=1, le=500, description="Количество задач на странице"),
+    cursor: Optional[str] = Query(None, pattern=r"^[0-9.eE+-]+:[0-9a-f]+$",
+                                  description="Курсор страницы из next_cursor предыдущего ответа"),
     queue: JobQueue = Depends()
 ):
     """
-    Получение информации об очереди задач
+    Получение информации об очереди задач и страницы списка задач
     """
     try:
         # Используем новый метод для получения статистики очереди
         stats = queue.get_queue_stats()
         
-        # Получаем все задачи
-        tasks = queue.get_all_tasks()
+        # Читаем только запрошенную страницу задач, позиции - одним запросом
+        tasks, next_cursor = queue.list_tasks_page(limit, cursor)
+        positions = queue.get_positions_bulk([task["task_id"] for task in tasks], tasks)
         
         # Преобразуем задачи в формат ответа
         task_statuses = []
-        for task in tasks:
-            position = queue.get_position(task["task_id"])
+        for task, position in zip(tasks, positions):
             task_statuses.append(TaskStatus(
                 task_id=task["task_id"],
                 status=task["status"],
@@ -79,10 +82,7 @@ async def get_queue_info(
                 retry_count=task.get("retry_count", 0)
             ))
         
-        # Сортируем задачи по времени создания (сначала новые)
-        task_statuses.sort(key=lambda x: x.created_at, reverse=True)
-        
-        return QueueInfo(
+        queue_info = QueueInfo(
             total_tasks=stats["total_tasks"],
             pending_tasks=stats["pending_tasks"],
             executing_tasks=stats["executing_tasks"],
@@ -90,8 +90,13 @@ async def get_queue_info(
             failed_tasks=stats["failed_tasks"],
             average_waiting_time=stats.get("average_waiting_time"),
             average_execution_time=stats.get("average_execution_time"),
-            tasks=task_statuses
+            tasks=task_statuses,
+            next_cursor=next_cursor
         )
+        
+        # Модель уже провалидирована: сериализуем ее напрямую, без повторной
+        # обработки через response_model
+        return Response(content=queue_info.model_dump_json(), media_type="application/json")
     
     except Exception as e:
         logger.error(f"Ошибка при получении информации об очереди: {str(e)}")
@@ -114,14 +119,9 @@ async def get_task_logs(
         if not task:
             raise HTTPException(status_code=404, detail=f"Задача с ID {task_id} не найдена")
         
-        # Получаем логи задачи
-        logs = queue.get_task_logs(task_id)
-        
-        # Лимитируем количество записей и сортируем по времени (сначала новые)
-        logs.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        if limit:
-            logs = logs[:limit]
+        # Получаем логи задачи: поток уже отдает записи от новых к старым,
+        # а лимит применяется на стороне Redis (XREVRANGE COUNT)
+        logs = queue.get_task_logs(task_id, limit=limit or LOG_MAX_ENTRIES)
         
         # Преобразуем логи в формат ответа
         response = []
@@ -134,7 +134,7 @@ async def get_task_logs(
                 details=log.get("details")
             ))
         
-        return response
+        return Response(content=dump_task_logs(response), media_type="application/json")
     
     except HTTPException:
         raise
@@ -170,7 +170,7 @@ async def retry_failed_task(
         
         # Получаем обновленный статус задачи
         updated_task = queue.get_task(task_id)
-        position = queue.get_position(task_id)
+        position = queue.get_position(task_id, updated_task)
         
         # Формируем ответ
         return TaskStatus(
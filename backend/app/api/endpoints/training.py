@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from typing import Dict, Any, List, Optional
 import logging
 import os
-import json
+import orjson
 from app.models.training import TrainingRequest, TrainingResponse, TrainingResult
 from app.core.queue import JobQueue
 from app.services.forecasting.training import prepare_training_task
@@ -24,16 +24,13 @@ async def train_model(
         # Подготавливаем параметры задачи
         task_params = prepare_training_task(request.params)
         
-        # Добавляем задачу в очередь
-        task_id = queue.add_task(
+        # Добавляем задачу в очередь и сразу получаем ее позицию
+        task_id, position = queue.enqueue_task(
             user_id=request.user_id,
             task_type="training",
             params=task_params
         )
         
-        # Получаем позицию в очереди
-        position = queue.get_position(task_id)
-        
         # Оцениваем время выполнения (условно)
         estimated_time = request.params.time_limit * 1.2  # 20% запас
         
@@ -115,8 +112,8 @@ async def get_trained_models():
                 continue
                 
             # Загружаем информацию о модели
-            with open(info_path, "r", encoding="utf-8") as f:
-                model_info = json.load(f)
+            with open(info_path, "rb") as f:
+                model_info = orjson.loads(f.read())
             
             # Получаем информацию о лидерборде, если есть
             leaderboard_path = os.path.join(model_path, "leaderboard.json")
@@ -126,8 +123,8 @@ async def get_trained_models():
             
             if os.path.exists(leaderboard_path):
                 try:
-                    with open(leaderboard_path, "r", encoding="utf-8") as f:
-                        leaderboard = json.load(f)
+                    with open(leaderboard_path, "rb") as f:
+                        leaderboard = orjson.loads(f.read())
                         
                     if leaderboard and len(leaderboard) > 0:
                         best_model = leaderboard[0].get("model")
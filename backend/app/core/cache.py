@@ -3,7 +3,7 @@ Cache management utilities
 """
 import redis
 from typing import Optional, Any
-import json
+import orjson
 import pickle
 import hashlib
 import logging
@@ -11,24 +11,30 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+SCAN_CHUNK = 500  # Количество ключей, удаляемых за один запрос
+
 class CacheManager:
     def __init__(self):
-        self.redis = redis.Redis(
+        # Пул с keepalive и ограничением соединений, как у очереди задач
+        self.redis = redis.Redis(connection_pool=redis.BlockingConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
-            db=1  # Используем отдельную БД для кеша
-        )
+            db=1,  # Используем отдельную БД для кеша
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            health_check_interval=30,
+            socket_keepalive=True,
+            socket_connect_timeout=2
+        ))
         self.default_ttl = 3600  # 1 час по умолчанию
 
     def _generate_key(self, prefix: str, params: dict) -> str:
         """
         Generate cache key from parameters
         """
-        # Сортируем параметры для стабильного хеша
-        sorted_params = dict(sorted(params.items()))
-        params_str = json.dumps(sorted_params)
+        # orjson сортирует ключи для стабильного хеша и сразу возвращает bytes
+        params_bytes = orjson.dumps(params, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
         # Создаем хеш параметров
-        params_hash = hashlib.md5(params_str.encode()).hexdigest()
+        params_hash = hashlib.md5(params_bytes).hexdigest()
         return f"{prefix}:{params_hash}"
 
     def get(self, prefix: str, params: dict) -> Optional[Any]:
@@ -75,7 +81,13 @@ class CacheManager:
         Clear all cached values with given prefix
         """
         try:
-            keys = self.redis.keys(f"{prefix}:*")
+            # SCAN вместо KEYS не блокирует Redis на больших базах
+            keys = []
+            for key in self.redis.scan_iter(match=f"{prefix}:*", count=SCAN_CHUNK):
+                keys.append(key)
+                if len(keys) >= SCAN_CHUNK:
+                    self.redis.delete(*keys)
+                    keys = []
             if keys:
                 self.redis.delete(*keys)
             return True
@@ -26,6 +26,10 @@ class Settings(BaseSettings):
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_URL: str = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))  # Размер пула соединений
+    # Сколько задач одновременно выполняет воркер вычислений (celery -Q compute -c N);
+    # диспетчер очереди передает в Celery не больше задач
+    COMPUTE_CONCURRENCY: int = int(os.getenv("COMPUTE_CONCURRENCY", "1"))
     
     # Настройки путей для хранения данных
     DATA_DIR: str = "data"
@@ -38,6 +42,8 @@ class Settings(BaseSettings):
     # Настройки обработки данных
     DEFAULT_CHUNK_SIZE: int = 100000  # Размер чанка для чтения больших файлов
     MAX_UPLOAD_SIZE_MB: int = 200  # Максимальный размер загружаемого файла в МБ
+    # Чтение CSV через pyarrow (если установлен); false - только парсер pandas
+    USE_FAST_CSV_IO: bool = os.getenv("USE_FAST_CSV_IO", "true").lower() == "true"
     
     # Настройки прогнозирования
     DEFAULT_PREDICTION_LENGTH: int = 10  # Длина прогноза по умолчанию
@@ -1,43 +1,449 @@
-import json
+import atexit
+import socket
+import zlib
 import time
-from typing import Dict, List, Any, Optional, Union
+import threading
+from collections import defaultdict, OrderedDict
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+import orjson
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
 from celery import Celery
-import uuid
+import secrets
 import logging
 from fastapi.logger import logger as fastapi_logger
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.handlers = fastapi_logger.handlers
 
+# Интервал сброса буфера логов задач в Redis (секунды)
+LOG_FLUSH_INTERVAL = 0.2
+# Максимальное количество записей лога на задачу (приблизительно, MAXLEN ~)
+LOG_MAX_ENTRIES = 1000
+
+# Отметка о том, что ключи старого формата (задача - JSON-строка task:<id>,
+# лог - список task_log:<id>) преобразованы в хеши и потоки
+LEGACY_MIGRATION_KEY = "tasks:legacy_migrated"
+# Хеш, в который старый формат записывал изменения задач (task_id -> JSON)
+LEGACY_TASKS_KEY = "tasks"
+
+# Хеш со счетчиками задач по статусам и суммами времени ожидания/выполнения
+STATS_KEY = "queue_stats"
+# Отметка о том, что счетчики один раз пересчитаны по задачам, созданным до их появления
+STATS_MIGRATION_KEY = "queue_stats:rebuilt"
+TASK_STATUSES = ("pending", "executing", "completed", "failed")
+
+# Сколько секунд claim_next_task ожидает появления задачи на стороне Redis
+QUEUE_POP_TIMEOUT = 5
+# Таймаут чтения сокета должен превышать время блокировки BLMOVE
+REDIS_SOCKET_TIMEOUT = QUEUE_POP_TIMEOUT + 5
+
+# Размер порции при обходе всех задач
+TASK_SCAN_CHUNK = 500
+
+# Поля задачи длиннее порога (обычно params и result) хранятся сжатыми.
+# Сжатое значение начинается с префикса, с которого не может начинаться JSON
+COMPRESS_THRESHOLD = 1024
+COMPRESSED_PREFIX = b"Z"
+
+# Индекс очереди для get_position: ZSET с монотонно растущими номерами
+QUEUE_INDEX_KEY = "task_queue_z"
+QUEUE_SEQ_KEY = "task_queue_seq"
+# Задачи, извлеченные из очереди через BLMOVE, но еще не переведенные в executing
+PROCESSING_KEY = "task_queue:processing"
+# Срок, до которого извлеченная задача должна быть запущена (ZSET, score = срок)
+CLAIMS_KEY = "task_queue:claimed_until"
+# Выполняющиеся задачи (ZSET, score = executing_until) для подсчета занятых мест
+EXECUTING_INDEX_KEY = "tasks:executing"
+
+# Индекс задач по времени создания (ZSET, score = created_at) для очистки
+CREATED_INDEX_KEY = "tasks:by_created_at"
+# Отметка о том, что в индекс один раз добавлены задачи, созданные до его появления
+CREATED_INDEX_MIGRATION_KEY = "tasks:by_created_at:rebuilt"
+
+# Постановка задачи в конец очереди с обновлением индекса позиций.
+# Возвращает длину очереди, то есть позицию новой задачи
+PUSH_TASK_SCRIPT = """
+local length = redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[3]), ARGV[1])
+return length
+"""
+
+# Обновление прогресса без чтения и перезаписи всей задачи.
+# Возвращает предыдущий этап ('' если его не было) или nil,
+# если задача не находится в состоянии executing
+UPDATE_PROGRESS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= ARGV[1] then
+    return false
+end
+local old_stage = redis.call('HGET', KEYS[1], 'stage')
+redis.call('HSET', KEYS[1], 'progress', ARGV[2], 'updated_at', ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[1], 'stage', ARGV[4])
+end
+return old_stage or ''
+"""
+
+# Атомарный перевод извлеченной задачи в состояние executing: меняются
+# только поля статуса и счетчики, запись задачи не перекодируется.
+# Идентификатор (ARGV[4]), уже перенесенный через BLMOVE в список
+# извлеченных задач (KEYS[3]), удаляется оттуда вместе со сроком
+# запуска (KEYS[4]). Задача, которая снова стоит в очереди (ее вернул
+# requeue_expired_claims), не запускается: ее выполнит следующая выдача.
+# Задача удаляется из индекса позиций (KEYS[2]) и попадает в индекс
+# выполняющихся (KEYS[5]).
+# Возвращает nil, если задача не найдена или снова в очереди, иначе
+# все поля задачи (HGETALL). Ключи задачи строятся как в _task_key
+START_TASK_SCRIPT = """
+local task_id = ARGV[4]
+redis.call('ZREM', KEYS[4], task_id)
+if redis.call('LREM', KEYS[3], 1, task_id) == 0 and redis.call('ZSCORE', KEYS[2], task_id) then
+    return false
+end
+redis.call('ZREM', KEYS[2], task_id)
+local task_key = 'task:' .. task_id
+local old_status = redis.call('HGET', task_key, 'status')
+if not old_status then
+    return false
+end
+redis.call('HSET', task_key, 'status', ARGV[1], 'updated_at', ARGV[2], 'started_at', ARGV[2], 'executing_until', ARGV[3])
+redis.call('ZADD', KEYS[5], ARGV[3], task_id)
+redis.call('HINCRBY', task_key, 'version', 1)
+redis.call('HINCRBY', KEYS[1], 'count:' .. cjson.decode(old_status), -1)
+redis.call('HINCRBY', KEYS[1], 'count:executing', 1)
+local created_at = tonumber(redis.call('HGET', task_key, 'created_at'))
+if created_at then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'wait_sum', tonumber(ARGV[2]) - created_at)
+    redis.call('HINCRBY', KEYS[1], 'wait_count', 1)
+end
+return redis.call('HGETALL', task_key)
+"""
+
+# Возврат извлеченной задачи в голову очереди, если она все еще в списке
+# извлеченных (KEYS[1]), то есть не была запущена; срок запуска (KEYS[3])
+# снимается. Возвращает 1, если задача возвращена
+REQUEUE_TASK_SCRIPT = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Возврат в очередь извлеченных задач (KEYS[1]), не запущенных до срока (KEYS[2]).
+# Задачам из списка без срока (процесс упал сразу после BLMOVE) срок
+# назначается сейчас: ARGV[2]. Просроченные записи индекса выполняющихся
+# задач (KEYS[4]) удаляются. Возвращает идентификаторы возвращенных задач
+REAP_CLAIMS_SCRIPT = """
+for _, task_id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    redis.call('ZADD', KEYS[2], 'NX', ARGV[2], task_id)
+end
+local requeued = {}
+-- Раньше извлеченные задачи возвращаются последними, то есть оказываются в голове очереди
+for _, task_id in ipairs(redis.call('ZREVRANGEBYSCORE', KEYS[2], ARGV[1], '-inf')) do
+    redis.call('ZREM', KEYS[2], task_id)
+    if redis.call('LREM', KEYS[1], 1, task_id) > 0 and redis.call('EXISTS', 'task:' .. task_id) == 1 then
+        redis.call('LPUSH', KEYS[3], task_id)
+        table.insert(requeued, task_id)
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', ARGV[1])
+return requeued
+"""
+
+# Сколько секунд извлеченная задача может ждать запуска в брокере,
+# прежде чем requeue_expired_claims вернет ее в очередь
+CLAIM_TTL = 600
+
+# Сколько секунд задача считается выполняющейся (поле executing_until)
+EXECUTING_TTL = 3600
+
+# Чтение задачи с учетом закешированной версии: возвращает 1, если версия
+# в Redis совпадает с ARGV[1], иначе все поля задачи (пусто, если ее нет)
+READ_TASK_SCRIPT = """
+local version = redis.call('HGET', KEYS[1], 'version')
+if version and version == ARGV[1] then
+    return 1
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# Удаление задач, созданных до ARGV[1], по индексу времени создания (KEYS[1]).
+# За вызов просматривается не больше ARGV[2] записей индекса начиная с позиции
+# ARGV[3], чтобы не блокировать Redis надолго. Остальные ARGV - статусы (JSON),
+# задачи в которых удаляются; записи индекса без задачи тоже удаляются.
+# Возвращает {просмотрено, оставлено, удаленные идентификаторы...}
+CLEANUP_TASKS_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', ARGV[3], ARGV[2])
+local removable = {}
+for i = 4, #ARGV do
+    removable[ARGV[i]] = true
+end
+local result = {#ids, 0}
+for _, task_id in ipairs(ids) do
+    local task_key = 'task:' .. task_id
+    local status = redis.call('HGET', task_key, 'status')
+    if status and not removable[status] then
+        result[2] = result[2] + 1
+    else
+        redis.call('DEL', task_key, 'task_log:' .. task_id)
+        redis.call('ZREM', KEYS[1], task_id)
+        redis.call('ZREM', KEYS[2], task_id)
+        if status then
+            redis.call('HINCRBY', KEYS[3], 'count:' .. cjson.decode(status), -1)
+            table.insert(result, task_id)
+        end
+    end
+end
+return result
+"""
+
+# Размер страницы списка задач по умолчанию
+TASK_PAGE_SIZE = 50
+
+# Количество записей индекса, просматриваемых за один вызов скрипта очистки
+CLEANUP_BATCH_SIZE = 500
+
+# Количество декодированных задач в кеше процесса
+TASK_CACHE_SIZE = 1024
+# Сколько секунд задача из кеша отдается без обращения к Redis
+TASK_CACHE_TTL = 1.0
+
+
+def _create_connection_pool() -> redis.BlockingConnectionPool:
+    """
+    Build the Redis connection pool used by the queue
+    
+    Connections are kept alive with TCP keepalive so pipelined batches are
+    sent over warm sockets (redis-py always enables TCP_NODELAY itself).
+    The pool is capped at REDIS_MAX_CONNECTIONS: request threads wait for a
+    free connection instead of opening new sockets under load.
+    Replies are parsed by hiredis when it is installed. They stay bytes
+    (no decode_responses), since compressed task fields are binary.
+    Connections are opened lazily on the first command; connection errors
+    are retried with exponential backoff. Timeouts are not retried: the
+    command may already have run on the server, and resending non-idempotent
+    writes (queue push, counters, log entries) would apply them twice.
+    """
+    keepalive_options = {}
+    # TCP_KEEPIDLE есть не на всех платформах (например, macOS)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        keepalive_options[socket.TCP_KEEPIDLE] = 30
+    return redis.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=0,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        # Соединения, простаивавшие дольше 30 секунд, проверяются PING перед использованием
+        health_check_interval=30,
+        socket_keepalive=True,
+        socket_keepalive_options=keepalive_options,
+        socket_connect_timeout=2,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), 3),
+        # OSError - ошибки сокета при установке соединения (отказ, DNS при старте контейнеров)
+        retry_on_error=[redis.ConnectionError, OSError]
+    )
+
+
+# orjson кодирует и декодирует значения в C и сразу возвращает bytes.
+# Типы numpy встречаются в результатах обучения, ключи словарей не всегда строки
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+_loads = orjson.loads
+
+
+def _dumps(value: Any) -> bytes:
+    """
+    Serialize a value to JSON bytes
+    """
+    return orjson.dumps(value, option=_ORJSON_OPTIONS)
+
+
+def _task_key(task_id: str) -> str:
+    """
+    Redis key of the hash holding a task record
+    """
+    return f"task:{task_id}"
+
+
+def _pack(value: Any) -> bytes:
+    """
+    Serialize a task field, compressing large values
+    """
+    data = _dumps(value)
+    if len(data) > COMPRESS_THRESHOLD:
+        return COMPRESSED_PREFIX + zlib.compress(data, 1)
+    return data
+
+
+def _unpack(data: bytes) -> Any:
+    """
+    Deserialize a task field written by _pack
+    """
+    if data.startswith(COMPRESSED_PREFIX):
+        data = zlib.decompress(data[len(COMPRESSED_PREFIX):])
+    return _loads(data)
+
+
+def _encode_fields(fields: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    Serialize task fields for a Redis hash (every value is stored as JSON)
+    """
+    return {name: _pack(value) for name, value in fields.items()}
+
+
+def _decode_fields(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    """
+    Deserialize a task record read with HGETALL
+    """
+    return {name.decode('utf-8'): _unpack(value) for name, value in raw.items()}
+
+
+def _log_entry(level: str, message: str, details: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the stream fields of a task log entry
+    """
+    return {
+        "timestamp": time.time(),
+        "level": level,
+        "message": message,
+        "details": _dumps(details)
+    }
+
+
+def _append_logs(pipe, task_id: str, entries: List[Dict[str, Any]]) -> None:
+    """
+    Append log entries to the task log stream as part of a pipeline
+    """
+    for entry in entries:
+        # Поток обрезается на стороне Redis той же командой
+        pipe.xadd(f"task_log:{task_id}", entry, maxlen=LOG_MAX_ENTRIES, approximate=True)
+
+
+def _known_position(task: Optional[Dict[str, Any]]) -> Optional[int]:
+    """
+    Position of a task that is derivable from its data alone
+    (None if the task is pending and its rank has to be read from Redis)
+    """
+    if not task or task.get("status") == "pending":
+        return None
+    executing_until = task.get("executing_until")
+    return 0 if executing_until and executing_until > time.time() else -1
+
+
+def _count_transition(pipe, old_status: Optional[str], new_status: str) -> None:
+    """
+    Move a task between status counters as part of a pipeline
+    """
+    if old_status:
+        pipe.hincrby(STATS_KEY, f"count:{old_status}", -1)
+    pipe.hincrby(STATS_KEY, f"count:{new_status}", 1)
+
+
+# Клиенты создаются один раз на процесс: JobQueue создается на каждый
+# запрос через Depends(), а подключение открывается лениво при первой команде
+_redis_client = redis.Redis(connection_pool=_create_connection_pool())
+# Единственное приложение Celery процесса; воркер настраивает его же (app.core.worker)
+celery_app = Celery('tasks', broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0")
+celery_app.conf.broker_pool_limit = settings.REDIS_MAX_CONNECTIONS
+_update_progress_script = _redis_client.register_script(UPDATE_PROGRESS_SCRIPT)
+_start_task_script = _redis_client.register_script(START_TASK_SCRIPT)
+_requeue_task_script = _redis_client.register_script(REQUEUE_TASK_SCRIPT)
+_reap_claims_script = _redis_client.register_script(REAP_CLAIMS_SCRIPT)
+_push_task_script = _redis_client.register_script(PUSH_TASK_SCRIPT)
+_read_task_script = _redis_client.register_script(READ_TASK_SCRIPT)
+_cleanup_tasks_script = _redis_client.register_script(CLEANUP_TASKS_SCRIPT)
+
+# Кеш декодированных задач: task_id -> (версия, данные задачи, время проверки).
+# Общий для процесса, так как опрос статуса создает JobQueue на каждый запрос
+_task_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_task_cache_lock = threading.Lock()
+
+
+def _forget_task(task_id: str) -> None:
+    """
+    Drop a task from the process cache after changing it
+    """
+    with _task_cache_lock:
+        _task_cache.pop(task_id, None)
+
+
+# Буфер логов задач и отложенных обновлений прогресса общий для процесса:
+# JobQueue создается на каждый запрос, а сбрасывает буфер один фоновый поток
+_log_buffer: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+# Отложенные обновления прогресса: task_id -> аргументы скрипта (последнее побеждает)
+_progress_buffer: Dict[str, Tuple[int, Optional[str], float]] = {}
+_log_lock = threading.Lock()
+# Устанавливается, когда в буфере появились записи
+_log_pending = threading.Event()
+_log_flusher: Optional[threading.Thread] = None
+
+
+def _schedule_flush() -> None:
+    """
+    Wake the flusher thread, starting it if needed (called under _log_lock)
+    """
+    global _log_flusher
+    _log_pending.set()
+    # После fork (воркеры Celery) поток родителя в дочернем процессе не существует
+    if _log_flusher is None or not _log_flusher.is_alive():
+        _log_flusher = threading.Thread(target=_flush_loop, name="task-log-flusher", daemon=True)
+        _log_flusher.start()
+
+
+def _flush_loop() -> None:
+    """
+    Flush the log buffer at most once per LOG_FLUSH_INTERVAL while it has entries
+    """
+    while True:
+        _log_pending.wait()
+        time.sleep(LOG_FLUSH_INTERVAL)
+        # Записи, добавленные после сброса флага, будут записаны следующим проходом
+        _log_pending.clear()
+        JobQueue().flush_logs()
+
+
+def _flush_at_exit() -> None:
+    """
+    Write what is left in the buffer: the flusher is a daemon thread
+    and does not delay process shutdown
+    """
+    if _log_buffer or _progress_buffer:
+        JobQueue().flush_logs()
+
+
+atexit.register(_flush_at_exit)
+
+
 class JobQueue:
     """
     Queue system for managing jobs to prevent server overload
     """
     def __init__(self):
         """
-        Initialize the job queue with Redis connection
+        Initialize the job queue with the shared Redis connection
         """
-        try:
-            # Initialize Redis connection
-            self.redis = redis.Redis(host='redis', port=6379, db=0, socket_connect_timeout=5)
-            self.redis.ping()
-            self.celery = Celery('tasks', broker='redis://redis:6379/0')
-            logger.info("Successfully initialized connection to Redis")
-        except Exception as e:
-            logger.error(f"Failed to initialize Redis connection: {str(e)}")
-            # Используем заглушку для Redis
-            self.redis = None
-            self.celery = None
+        self.redis = _redis_client
+        self.celery = celery_app
+        self._update_progress = _update_progress_script
+        self._start_task = _start_task_script
+        self._requeue_task = _requeue_task_script
+        self._reap_claims = _reap_claims_script
+        self._push_task = _push_task_script
+        self._read_task = _read_task_script
+        self._cleanup_tasks = _cleanup_tasks_script
             
     # Заглушка для ensure_backward_compatibility
     async def initialize(self):
         """
-        Stub method for backward compatibility
+        Convert keys left by the old storage format on startup
         """
-        logger.info("Using synchronous initialization, this method is a noop.")
-        pass
+        self.ensure_legacy_migrated()
 
     def add_task(self, user_id: str, task_type: str, params: Dict[str, Any]) -> str:
         """
@@ -51,12 +457,27 @@ class JobQueue:
         Returns:
             str: Task ID
         """
+        task_id, _ = self.enqueue_task(user_id, task_type, params)
+        return task_id
+
+    def enqueue_task(self, user_id: str, task_type: str, params: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Add a task to the queue in a single round-trip
+        
+        Args:
+            user_id: User identifier
+            task_type: Type of task (prediction, training, etc.)
+            params: Task parameters
+            
+        Returns:
+            Tuple[str, int]: Task ID and its position in the queue
+        """
         if not self.redis:
             logger.warning("Redis is not available, can't add task")
-            return str(uuid.uuid4())  # Return a fake ID
+            return secrets.token_hex(8), -1  # Return a fake ID
 
-        # Generate task ID
-        task_id = str(uuid.uuid4())
+        # Generate task ID: 64 random bits, short but still unguessable
+        task_id = secrets.token_hex(8)
         
         # Create task data
         task_data = {
@@ -66,29 +487,33 @@ class JobQueue:
             "params": params,
             "status": "pending",
             "created_at": time.time(),
-            "updated_at": time.time()
+            "updated_at": time.time(),
+            # Увеличивается при каждом изменении задачи (см. get_task)
+            "version": 1
         }
         
-        # Convert task data to JSON
-        task_json = json.dumps(task_data)
-        
-        # Add task to queue
-        self.redis.lpush("task_queue", task_id)
-        
+        pipe = self.redis.pipeline(transaction=True)
         # Store task data
-        self.redis.set(f"task:{task_id}", task_json)
-        
+        pipe.hset(_task_key(task_id), mapping=_encode_fields(task_data))
+        # Add task to the tail of the queue (tasks are taken from the head)
+        self._push(pipe, task_id)
+        _count_transition(pipe, None, "pending")
+        pipe.zadd(CREATED_INDEX_KEY, {task_id: task_data["created_at"]})
         # Log task creation
-        self.add_task_log(task_id, "info", f"Task created: {task_type}")
+        _append_logs(pipe, task_id, [_log_entry("info", f"Task created: {task_type}")])
+        # Скрипт постановки возвращает длину очереди, то есть позицию новой задачи
+        _, position, *_ = pipe.execute()
         
-        return task_id
+        return task_id, position
 
-    def get_position(self, task_id: str) -> int:
+    def get_position(self, task_id: str, task: Optional[Dict[str, Any]] = None) -> int:
         """
         Get the position of a task in the queue
         
         Args:
             task_id: Task ID
+            task: Already loaded task data; the position of a task that is
+                not pending is derived from it without querying Redis
             
         Returns:
             int: Position in queue (0 if executing, -1 if not in queue)
@@ -96,46 +521,175 @@ class JobQueue:
         if not self.redis:
             return -1
 
-        # Check if task is in queue
-        queue = self.redis.lrange("task_queue", 0, -1)
-        queue = [item.decode('utf-8') for item in queue]
-        
-        if task_id in queue:
-            return queue.index(task_id) + 1
+        return self.get_positions_bulk([task_id], [task] if task else None)[0]
+    
+    def get_positions_bulk(self, task_ids: List[str], tasks: Optional[List[Dict[str, Any]]] = None) -> List[int]:
+        """
+        Get the positions of several tasks in one round-trip
         
-        # Check if task is executing
-        executing = self.redis.get(f"executing:{task_id}")
-        if executing:
-            return 0
+        Args:
+            task_ids: Task IDs
+            tasks: Already loaded task data in the same order (see get_position)
             
-        return -1
+        Returns:
+            List[int]: Positions in the order of task_ids (see get_position)
+        """
+        if not self.redis:
+            return [-1] * len(task_ids)
+
+        positions = [_known_position(task) for task in tasks] if tasks else [None] * len(task_ids)
+        unknown = [task_id for task_id, position in zip(task_ids, positions) if position is None]
+        if not unknown:
+            return positions
+
+        # Rank in the queue index and the execution deadline of the remaining tasks
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in unknown:
+            pipe.zrank(QUEUE_INDEX_KEY, task_id)
+            pipe.hget(_task_key(task_id), "executing_until")
+        replies = iter(pipe.execute())
+        
+        now = time.time()
+        for i, position in enumerate(positions):
+            if position is not None:
+                continue
+            rank, executing_until = next(replies), next(replies)
+            if rank is not None:
+                positions[i] = rank + 1
+            elif executing_until and _loads(executing_until) > now:
+                positions[i] = 0
+            else:
+                positions[i] = -1
+        return positions
+    
+    def _push(self, pipe, task_id: str) -> None:
+        """
+        Add a task to the tail of the queue and of the position index
+        as part of a pipeline
+        """
+        self._push_task(keys=["task_queue", QUEUE_INDEX_KEY, QUEUE_SEQ_KEY], args=[task_id], client=pipe)
     
-    def get_next_task(self) -> Optional[Dict[str, Any]]:
+    def claim_next_task(self, timeout: int = QUEUE_POP_TIMEOUT) -> Optional[str]:
         """
-        Get the next task from queue and mark it as executing
+        Take the next task for hand-off to a worker without starting it
+        
+        The task id is moved to PROCESSING_KEY (BLMOVE) with a start deadline
+        of CLAIM_TTL seconds. The task stays pending and keeps its queue
+        position until the worker calls start_task; if it is not started in
+        time, requeue_expired_claims puts it back at the head of the queue.
         
+        Args:
+            timeout: Maximum time to wait for a task in seconds (0 - do not wait)
+            
         Returns:
-            task_data: Task data or None if queue is empty
+            Task ID or None if the queue is empty
         """
-        task_id = self.redis.lpop("task_queue")
-        if not task_id:
+        if not self.redis:
             return None
+
+        # BLMOVE с нулевым таймаутом ждал бы бесконечно
+        if timeout:
+            popped = self.redis.blmove("task_queue", PROCESSING_KEY, timeout, "LEFT", "RIGHT")
+        else:
+            popped = self.redis.lmove("task_queue", PROCESSING_KEY, "LEFT", "RIGHT")
+        if popped is None:
+            return None
+        task_id = popped.decode('utf-8')
+        # Если срок не запишется, его назначит requeue_expired_claims
+        self.redis.zadd(CLAIMS_KEY, {task_id: time.time() + CLAIM_TTL})
+        return task_id
+    
+    def release_task(self, task_id: str) -> bool:
+        """
+        Return a claimed task that was not started to the head of the queue
         
-        task_id = task_id.decode('utf-8')
-        task_data = self.redis.hget("tasks", task_id)
+        Args:
+            task_id: Task ID returned by claim_next_task
+            
+        Returns:
+            True if the task was returned (False if it has already started)
+        """
+        return bool(self._requeue_task(keys=[PROCESSING_KEY, "task_queue", CLAIMS_KEY], args=[task_id]))
+    
+    def start_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Mark a claimed task as executing when a worker actually begins it
         
-        if not task_data:
-            return None
+        Args:
+            task_id: Task ID
             
-        task_json = json.loads(task_data)
-        task_json["status"] = "executing"
-        task_json["updated_at"] = time.time()
+        Returns:
+            Task data or None if the task does not exist or is back in the queue
+        """
+        if not self.redis:
+            return self.get_task(task_id)
+
+        now = time.time()
+        task_data = self._start_task(
+            keys=[STATS_KEY, QUEUE_INDEX_KEY, PROCESSING_KEY, CLAIMS_KEY, EXECUTING_INDEX_KEY],
+            args=[_dumps("executing"), _dumps(now), _dumps(now + EXECUTING_TTL), task_id]
+        )
+        return self._started_task(task_data)
+    
+    def active_task_count(self) -> int:
+        """
+        Number of tasks handed to workers: claimed but not started
+        plus executing within their EXECUTING_TTL
+        """
+        if not self.redis:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(PROCESSING_KEY)
+        pipe.zcount(EXECUTING_INDEX_KEY, time.time(), "+inf")
+        return sum(pipe.execute())
+    
+    def requeue_expired_claims(self) -> List[str]:
+        """
+        Return claimed tasks that were not started within CLAIM_TTL to the
+        head of the queue (e.g. the hand-off to Celery failed or the
+        dispatcher died right after claiming)
         
-        # Mark as executing
-        self.redis.hset("tasks", task_id, json.dumps(task_json))
-        self.redis.set(f"executing:{task_id}", "1", ex=3600)  # 1 hour expiry
+        Returns:
+            IDs of the returned tasks
+        """
+        if not self.redis:
+            return []
+
+        now = time.time()
+        requeued = self._reap_claims(
+            keys=[PROCESSING_KEY, CLAIMS_KEY, "task_queue", EXECUTING_INDEX_KEY],
+            args=[now, now + CLAIM_TTL]
+        )
+        return [task_id.decode('utf-8') for task_id in requeued]
+    
+    def _started_task(self, task_data) -> Optional[Dict[str, Any]]:
+        """
+        Decode the reply of START_TASK_SCRIPT
+        """
+        if not task_data:
+            return None
+        # HGETALL из Lua возвращает плоский список [поле, значение, ...]
+        task = _decode_fields(dict(zip(task_data[::2], task_data[1::2])))
+        _forget_task(task["task_id"])
+        return task
+    
+    def mark_started(self, task_id: str) -> None:
+        """
+        Record the moment execution actually began (start_time), unless it
+        is already set; only this field of the task is written
         
-        return task_json
+        Args:
+            task_id: ID of the task
+        """
+        if not self.redis:
+            return
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hsetnx(_task_key(task_id), "start_time", _dumps(time.time()))
+        pipe.hincrby(_task_key(task_id), "version", 1)
+        pipe.execute()
+        _forget_task(task_id)
     
     def complete_task(self, task_id: str, result: Dict[str, Any] = None) -> None:
         """
@@ -145,31 +699,39 @@ class JobQueue:
             task_id: ID of the task
             result: Result data from task execution
         """
-        task_data = self.redis.hget("tasks", task_id)
-        if not task_data:
+        old_status, start_time = self.redis.hmget(_task_key(task_id), ["status", "start_time"])
+        if not old_status:
             return
             
-        task_json = json.loads(task_data)
-        task_json["status"] = "completed"
-        task_json["updated_at"] = time.time()
-        task_json["result"] = result
+        changes = {
+            "status": "completed",
+            "updated_at": time.time(),
+            "result": result
+        }
         
+        pipe = self.redis.pipeline()
         # Calculate execution duration
-        if task_json.get("start_time"):
-            task_json["execution_duration"] = task_json["updated_at"] - task_json["start_time"]
+        start_time = _loads(start_time) if start_time else None
+        if start_time:
+            changes["execution_duration"] = changes["updated_at"] - start_time
+            pipe.hincrbyfloat(STATS_KEY, "execution_sum", changes["execution_duration"])
+            pipe.hincrby(STATS_KEY, "execution_count", 1)
         
         # Update task data
-        self.redis.hset("tasks", task_id, json.dumps(task_json))
-        # Remove executing flag
-        self.redis.delete(f"executing:{task_id}")
-        
-        # Add final log entry
-        self.add_task_log(
-            task_id, 
-            "INFO", 
+        pipe.hset(_task_key(task_id), mapping=_encode_fields(changes))
+        pipe.hincrby(_task_key(task_id), "version", 1)
+        # Remove execution deadline
+        pipe.hdel(_task_key(task_id), "executing_until")
+        pipe.zrem(EXECUTING_INDEX_KEY, task_id)
+        _count_transition(pipe, _loads(old_status), "completed")
+        # Add final log entry after the still buffered ones
+        _append_logs(pipe, task_id, self._take_buffered_logs(task_id) + [_log_entry(
+            "INFO",
             "Задача успешно завершена",
             {"result_summary": result.get("summary") if result and isinstance(result, dict) else None}
-        )
+        )])
+        pipe.execute()
+        _forget_task(task_id)
         
         logger.info(f"Task {task_id} marked as completed")
     
@@ -181,30 +743,38 @@ class JobQueue:
             task_id: ID of the task
             error: Error message
         """
-        task_data = self.redis.hget("tasks", task_id)
-        if not task_data:
+        old_status, start_time = self.redis.hmget(_task_key(task_id), ["status", "start_time"])
+        if not old_status:
             return
             
-        task_json = json.loads(task_data)
-        task_json["status"] = "failed"
-        task_json["updated_at"] = time.time()
-        task_json["error"] = error
+        changes = {
+            "status": "failed",
+            "updated_at": time.time(),
+            "error": error
+        }
         
+        pipe = self.redis.pipeline()
         # Calculate execution duration
-        if task_json.get("start_time"):
-            task_json["execution_duration"] = task_json["updated_at"] - task_json["start_time"]
+        start_time = _loads(start_time) if start_time else None
+        if start_time:
+            changes["execution_duration"] = changes["updated_at"] - start_time
+            pipe.hincrbyfloat(STATS_KEY, "execution_sum", changes["execution_duration"])
+            pipe.hincrby(STATS_KEY, "execution_count", 1)
         
         # Update task data
-        self.redis.hset("tasks", task_id, json.dumps(task_json))
-        # Remove executing flag
-        self.redis.delete(f"executing:{task_id}")
-        
-        # Add error log entry
-        self.add_task_log(
-            task_id, 
-            "ERROR", 
+        pipe.hset(_task_key(task_id), mapping=_encode_fields(changes))
+        pipe.hincrby(_task_key(task_id), "version", 1)
+        # Remove execution deadline
+        pipe.hdel(_task_key(task_id), "executing_until")
+        pipe.zrem(EXECUTING_INDEX_KEY, task_id)
+        _count_transition(pipe, _loads(old_status), "failed")
+        # Add error log entry after the still buffered ones
+        _append_logs(pipe, task_id, self._take_buffered_logs(task_id) + [_log_entry(
+            "ERROR",
             f"Задача завершилась с ошибкой: {error}"
-        )
+        )])
+        pipe.execute()
+        _forget_task(task_id)
         
         logger.info(f"Task {task_id} marked as failed: {error}")
     
@@ -215,31 +785,73 @@ class JobQueue:
         Returns:
             List[Dict[str, Any]]: List of tasks
         """
-        if not self.redis:
-            return []
+        return list(self.iter_tasks())
 
-        # Get all task keys
-        tasks = []
-        task_keys = self.redis.keys("task:*")
-        
-        # Get task data
-        for key in task_keys:
-            task_json = self.redis.get(key)
-            if task_json:
-                task = json.loads(task_json)
-                tasks.append(task)
-                
-        return tasks
-    
-    def _get_queue_length(self) -> int:
+    def iter_tasks(self, chunk: int = TASK_SCAN_CHUNK, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
         """
-        Get the current length of the queue
+        Iterate over all tasks without materializing them at once
         
-        Returns:
-            length: Number of tasks in queue
+        Keys are collected with SCAN (non-blocking for Redis, unlike KEYS) and
+        each portion of keys is read with one pipelined round-trip.
+        
+        Args:
+            chunk: Number of tasks fetched per round-trip
+            fields: Read only these fields (plus task_id) instead of the whole
+                task, e.g. to skip large params and result
+            
+        Yields:
+            Dict[str, Any]: Task data
+        """
+        if not self.redis:
+            return
+
+        for keys in self._scan_task_keys(chunk):
+            if fields:
+                yield from self._read_task_fields(keys, ["task_id", *fields])
+            else:
+                yield from self._read_tasks(keys)
+
+    def _scan_task_keys(self, chunk: int = TASK_SCAN_CHUNK, match: str = "task:*",
+                        key_type: str = "HASH") -> Iterator[List[bytes]]:
         """
-        return self.redis.llen("task_queue")
+        Collect task keys with SCAN in portions of at most chunk keys
         
+        Only keys of key_type are returned (SCAN TYPE), so keys of the old
+        format never reach HGETALL/HMGET.
+        """
+        keys = []
+        for key in self.redis.scan_iter(match=match, count=chunk, _type=key_type):
+            keys.append(key)
+            if len(keys) >= chunk:
+                yield keys
+                keys = []
+        if keys:
+            yield keys
+
+    def _read_tasks(self, keys: List[bytes]) -> Iterator[Dict[str, Any]]:
+        """
+        Read several task hashes in one pipeline
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        for task_data in pipe.execute():
+            # Задача могла быть удалена между SCAN и HGETALL
+            if task_data:
+                yield _decode_fields(task_data)
+    
+    def _read_task_fields(self, keys: List[bytes], fields: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Read selected fields of several tasks in one pipeline
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, fields)
+        for values in pipe.execute():
+            # Задача могла быть удалена между SCAN и HMGET
+            if values[0]:
+                yield {name: _unpack(value) if value else None for name, value in zip(fields, values)}
+    
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a task by ID
@@ -259,10 +871,116 @@ class JobQueue:
                 "updated_at": time.time()
             }
 
-        task_json = self.redis.get(f"task:{task_id}")
-        if task_json:
-            return json.loads(task_json)
-        return None
+        now = time.monotonic()
+        with _task_cache_lock:
+            cached = _task_cache.get(task_id)
+        
+        # Недавно проверенная задача отдается без запроса к Redis
+        if cached and now - cached[2] < TASK_CACHE_TTL:
+            return dict(cached[1])
+        
+        # Если задача не менялась, повторно не передаем и не декодируем ее
+        try:
+            reply = self._read_task(keys=[_task_key(task_id)], args=[cached[0] if cached else ""])
+        except redis.ResponseError as e:
+            # Задача старого формата: ключи преобразуются, и чтение повторяется
+            if "WRONGTYPE" not in str(e):
+                raise
+            self.migrate_legacy_keys()
+            reply = self._read_task(keys=[_task_key(task_id)], args=[""])
+        
+        if reply == 1:
+            with _task_cache_lock:
+                _task_cache[task_id] = (cached[0], cached[1], now)
+                _task_cache.move_to_end(task_id)
+            return dict(cached[1])
+        
+        if not reply:
+            with _task_cache_lock:
+                _task_cache.pop(task_id, None)
+            return None
+        
+        # HGETALL из Lua возвращает плоский список [поле, значение, ...]
+        task = _decode_fields(dict(zip(reply[::2], reply[1::2])))
+        if "version" in task:
+            with _task_cache_lock:
+                _task_cache[task_id] = (str(task["version"]), task, now)
+                _task_cache.move_to_end(task_id)
+                if len(_task_cache) > TASK_CACHE_SIZE:
+                    _task_cache.popitem(last=False)
+        return dict(task)
+
+    def get_tasks_bulk(self, task_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get several tasks in one round-trip
+        
+        Args:
+            task_ids: Task IDs
+            
+        Returns:
+            List of task data (None for missing tasks) in the order of task_ids
+        """
+        if not self.redis:
+            return [self.get_task(task_id) for task_id in task_ids]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(_task_key(task_id))
+        return [_decode_fields(task_data) if task_data else None for task_data in pipe.execute()]
+
+    def list_tasks_page(self, limit: int = TASK_PAGE_SIZE,
+                        cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of tasks, newest first, using the creation-time index
+        
+        Args:
+            limit: Maximum number of tasks on the page
+            cursor: Cursor returned with the previous page (None for the first page)
+            
+        Returns:
+            Tuple of the tasks on the page and the cursor of the next page
+            (None if this page is the last one)
+        """
+        if not self.redis:
+            return [], None
+
+        # Задачи, созданные до появления индекса, добавляются в него один раз.
+        # Сам индекс для этого не проверяется: его создает первая же новая задача
+        self.ensure_legacy_migrated()
+        if not self.redis.exists(CREATED_INDEX_MIGRATION_KEY):
+            self.rebuild_created_index()
+
+        # Курсор - время создания и идентификатор последней задачи предыдущей страницы.
+        # Задачи с тем же временем создания (пакетная постановка) идут в порядке
+        # убывания идентификатора, поэтому граница включается, а уже показанные
+        # задачи с этим временем пропускаются по идентификатору
+        last_score, last_id = None, None
+        if cursor is not None:
+            score, _, task_id = cursor.partition(":")
+            last_score, last_id = float(score), task_id.encode('utf-8')
+        max_score = repr(last_score) if last_score is not None else "+inf"
+        
+        entries = []
+        offset = 0
+        while len(entries) < limit:
+            batch = self.redis.zrevrangebyscore(
+                CREATED_INDEX_KEY, max_score, "-inf", start=offset, num=limit, withscores=True
+            )
+            offset += len(batch)
+            entries.extend(
+                (task_id, score) for task_id, score in batch
+                if not (score == last_score and task_id >= last_id)
+            )
+            if len(batch) < limit:
+                break
+        entries = entries[:limit]
+        
+        tasks = [task for task in self.get_tasks_bulk([task_id.decode('utf-8') for task_id, _ in entries]) if task]
+        next_cursor = None
+        if len(entries) == limit:
+            task_id, score = entries[-1]
+            next_cursor = f"{score!r}:{task_id.decode('utf-8')}"
+        return tasks, next_cursor
 
     def get_task_logs(self, task_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -275,34 +993,85 @@ class JobQueue:
         Returns:
             List of task logs
         """
-        # Get logs from Redis
-        logs_data = self.redis.lrange(f"task_log:{task_id}", 0, limit - 1)
+        # Записываем накопленные логи, чтобы чтение видело собственные записи
+        self.flush_logs()
+
+        # Get logs from Redis (newest first)
+        try:
+            entries = self.redis.xrevrange(f"task_log:{task_id}", count=limit)
+        except redis.ResponseError as e:
+            # Лог старого формата (список): ключи преобразуются, и чтение повторяется
+            if "WRONGTYPE" not in str(e):
+                raise
+            self.migrate_legacy_keys()
+            entries = self.redis.xrevrange(f"task_log:{task_id}", count=limit)
         logs = []
-        for log_data in logs_data:
-            log = json.loads(log_data)
-            logs.append(log)
+        for _, fields in entries:
+            logs.append({
+                "timestamp": float(fields[b"timestamp"]),
+                "level": fields[b"level"].decode('utf-8'),
+                "message": fields[b"message"].decode('utf-8'),
+                "details": _loads(fields[b"details"])
+            })
         return logs
 
     def add_task_log(self, task_id: str, level: str, message: str, details: Optional[Dict[str, Any]] = None) -> None:
         """
         Add a log entry for a task
         
+        Entries are buffered per process and written to Redis in a single
+        pipeline every LOG_FLUSH_INTERVAL seconds by one background thread
+        (see flush_logs).
+        
         Args:
             task_id: ID of the task
             level: Log level (INFO, WARNING, ERROR)
             message: Log message
             details: Additional information
         """
-        log_entry = {
-            "timestamp": time.time(),
-            "level": level,
-            "message": message,
-            "details": details
-        }
-        # Add log to the beginning of the list (so new ones are first)
-        self.redis.lpush(f"task_log:{task_id}", json.dumps(log_entry))
-        # Limit the number of log entries
-        self.redis.ltrim(f"task_log:{task_id}", 0, 999)  # Store maximum 1000 entries
+        if not self.redis:
+            return
+
+        with _log_lock:
+            _log_buffer[task_id].append(_log_entry(level, message, details))
+            _schedule_flush()
+
+    def flush_logs(self) -> None:
+        """
+        Write buffered log entries and progress updates to Redis in one round-trip
+        """
+        with _log_lock:
+            buffer = dict(_log_buffer)
+            _log_buffer.clear()
+            progress = dict(_progress_buffer)
+            _progress_buffer.clear()
+
+        if not (buffer or progress) or not self.redis:
+            return
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for task_id, entries in buffer.items():
+                _append_logs(pipe, task_id, entries)
+            for task_id, (value, stage, updated_at) in progress.items():
+                self._call_update_progress(task_id, value, stage, updated_at, client=pipe)
+            replies = pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to flush task logs: {str(e)}")
+            return
+
+        # Ответы скриптов прогресса идут после ответов XADD
+        progress_replies = replies[len(replies) - len(progress):]
+        for (task_id, (value, stage, _)), old_stage in zip(progress.items(), progress_replies):
+            self._after_progress(task_id, value, stage, old_stage)
+
+    def _take_buffered_logs(self, task_id: str) -> List[Dict[str, Any]]:
+        """
+        Remove and return buffered log entries of one task, so they can be
+        written in the same pipeline as a state change of that task
+        """
+        with _log_lock:
+            return _log_buffer.pop(task_id, [])
 
     def retry_task(self, task_id: str) -> bool:
         """
@@ -318,39 +1087,43 @@ class JobQueue:
             logger.error("Не указан ID задачи для повторной попытки")
             return False
             
-        task_data = self.redis.hget("tasks", task_id)
-        if not task_data:
+        status, retry_count = self.redis.hmget(_task_key(task_id), ["status", "retry_count"])
+        if not status:
             logger.error(f"Задача с ID {task_id} не найдена")
             return False
             
-        task_json = json.loads(task_data)
-        if task_json["status"] != "failed":
-            logger.error(f"Задача с ID {task_id} не находится в состоянии 'failed' (текущий статус: {task_json['status']})")
+        status = _loads(status)
+        if status != "failed":
+            logger.error(f"Задача с ID {task_id} не находится в состоянии 'failed' (текущий статус: {status})")
             return False
         
         # Обновляем состояние задачи
-        task_json["status"] = "pending"
-        task_json["updated_at"] = time.time()
-        task_json["retry_count"] = task_json.get("retry_count", 0) + 1
-        task_json["error"] = None
+        task_json = {
+            "status": "pending",
+            "updated_at": time.time(),
+            "retry_count": (_loads(retry_count) if retry_count else 0) + 1,
+            "error": None
+        }
         
-        # Добавляем задачу в очередь
-        self.redis.hset("tasks", task_id, json.dumps(task_json))
-        self.redis.rpush("task_queue", task_id)
+        # Добавляем задачу в очередь и запись в лог задачи за один запрос
+        pipe = self.redis.pipeline()
+        pipe.hset(_task_key(task_id), mapping=_encode_fields(task_json))
+        pipe.hincrby(_task_key(task_id), "version", 1)
+        self._push(pipe, task_id)
+        _count_transition(pipe, status, "pending")
+        _append_logs(pipe, task_id, self._take_buffered_logs(task_id) + [_log_entry(
+            "INFO",
+            f"Задача добавлена для повторного выполнения (попытка #{task_json['retry_count']})"
+        )])
+        pipe.execute()
+        _forget_task(task_id)
         
         # Логируем операцию
         logger.info(f"Задача {task_id} добавлена для повторной попытки (попытка #{task_json['retry_count']})")
         
-        # Добавляем запись в лог задачи
-        self.add_task_log(
-            task_id, 
-            "INFO", 
-            f"Задача добавлена для повторного выполнения (попытка #{task_json['retry_count']})"
-        )
-        
         return True
 
-    def update_task_progress(self, task_id: str, progress: int, stage: Optional[str] = None) -> bool:
+    def update_task_progress(self, task_id: str, progress: int, stage: Optional[str] = None, wait: bool = True) -> bool:
         """
         Update task progress
         
@@ -358,25 +1131,42 @@ class JobQueue:
             task_id: ID of the task
             progress: Progress percentage (0-100)
             stage: Current stage of execution
+            wait: If False, the update is buffered and sent with the next
+                flush (see flush_logs), so the caller never waits for Redis
             
         Returns:
-            True if update was successful, otherwise False
+            True if update was successful (or buffered), otherwise False
         """
-        task_data = self.redis.hget("tasks", task_id)
-        if not task_data:
-            return False
-            
-        task_json = json.loads(task_data)
-        
-        # Check that task is in executing state
-        if task_json["status"] != "executing":
+        if not wait:
+            with _log_lock:
+                _progress_buffer[task_id] = (progress, stage, time.time())
+                _schedule_flush()
+            return True
+
+        old_stage = self._call_update_progress(task_id, progress, stage, time.time())
+        return self._after_progress(task_id, progress, stage, old_stage)
+
+    def _call_update_progress(self, task_id: str, progress: int, stage: Optional[str], updated_at: float, client=None):
+        """
+        Run UPDATE_PROGRESS_SCRIPT, directly or as part of a pipeline
+        """
+        # Only the changed fields are written; the status check happens server-side
+        return self._update_progress(
+            keys=[_task_key(task_id)],
+            args=[_dumps("executing"), _dumps(progress), _dumps(updated_at), _dumps(stage) if stage else ""],
+            client=client
+        )
+
+    def _after_progress(self, task_id: str, progress: int, stage: Optional[str], old_stage: Optional[bytes]) -> bool:
+        """
+        Handle the reply of UPDATE_PROGRESS_SCRIPT
+        """
+        # Task is missing or not in executing state
+        if old_stage is None:
             return False
+        _forget_task(task_id)
         
-        task_json["progress"] = progress
-        task_json["updated_at"] = time.time()
-        
-        if stage and task_json.get("stage") != stage:
-            task_json["stage"] = stage
+        if stage and old_stage != _dumps(stage):
             # Add log entry when stage changes
             self.add_task_log(
                 task_id, 
@@ -384,7 +1174,6 @@ class JobQueue:
                 f"Execution stage: {stage}, progress: {progress}%"
             )
         
-        self.redis.hset("tasks", task_id, json.dumps(task_json))
         return True
 
     def get_queue_stats(self) -> Dict[str, Any]:
@@ -403,49 +1192,177 @@ class JobQueue:
                 "failed_tasks": 0
             }
 
-        # Get all tasks
-        tasks = self.get_all_tasks()
+        self.ensure_legacy_migrated()
+        # Задачи, созданные до появления счетчиков, учитываются один раз.
+        # Наличие хеша счетчиков ничего не говорит: его создает первая же
+        # смена статуса, поэтому пересчет отмечается отдельным ключом
+        if not self.redis.exists(STATS_MIGRATION_KEY):
+            self.rebuild_stats()
         
-        # Count by status
-        total = len(tasks)
-        pending = sum(1 for task in tasks if task.get("status") == "pending")
-        executing = sum(1 for task in tasks if task.get("status") == "executing")
-        completed = sum(1 for task in tasks if task.get("status") == "completed")
-        failed = sum(1 for task in tasks if task.get("status") == "failed")
+        # Счетчики обновляются при каждой смене статуса, поэтому
+        # статистика читается одной командой без обхода всех задач
+        raw = self.redis.hgetall(STATS_KEY)
+        raw = {name.decode('utf-8'): float(value) for name, value in raw.items()}
+        counts = {status: max(int(raw.get(f"count:{status}", 0)), 0) for status in TASK_STATUSES}
         
         # Calculate average waiting and execution times
-        waiting_times = []
-        execution_times = []
-        
-        for task in tasks:
-            created_at = task.get("created_at", 0)
-            started_at = task.get("started_at")
-            completed_at = task.get("completed_at")
-            
-            if started_at and created_at:
-                waiting_time = started_at - created_at
-                waiting_times.append(waiting_time)
-                
-            if completed_at and started_at:
-                execution_time = completed_at - started_at
-                execution_times.append(execution_time)
-                
-        avg_waiting_time = sum(waiting_times) / len(waiting_times) if waiting_times else None
-        avg_execution_time = sum(execution_times) / len(execution_times) if execution_times else None
+        avg_waiting_time = raw["wait_sum"] / raw["wait_count"] if raw.get("wait_count") else None
+        avg_execution_time = raw["execution_sum"] / raw["execution_count"] if raw.get("execution_count") else None
         
         return {
-            "total_tasks": total,
-            "pending_tasks": pending,
-            "executing_tasks": executing,
-            "completed_tasks": completed,
-            "failed_tasks": failed,
+            "total_tasks": sum(counts.values()),
+            "pending_tasks": counts["pending"],
+            "executing_tasks": counts["executing"],
+            "completed_tasks": counts["completed"],
+            "failed_tasks": counts["failed"],
             "average_waiting_time": avg_waiting_time,
             "average_execution_time": avg_execution_time
         }
     
+    def delete_tasks_created_before(self, timestamp: float, statuses: List[str],
+                                    batch: int = CLEANUP_BATCH_SIZE) -> int:
+        """
+        Delete tasks created before a moment together with their logs
+        
+        The sweep runs server-side (CLEANUP_TASKS_SCRIPT) over the creation-time
+        index, one script call per batch of index entries.
+        
+        Args:
+            timestamp: Upper bound of created_at (inclusive)
+            statuses: Statuses of the tasks to delete
+            batch: Number of index entries examined per script call
+            
+        Returns:
+            int: Number of deleted tasks
+        """
+        if not self.redis:
+            return 0
+
+        # Задачи, созданные до появления индекса, добавляются в него один раз.
+        # Сам индекс для этого не проверяется: его создает первая же новая задача
+        self.ensure_legacy_migrated()
+        if not self.redis.exists(CREATED_INDEX_MIGRATION_KEY):
+            self.rebuild_created_index()
+
+        status_args = [_dumps(status) for status in statuses]
+        deleted = 0
+        # Оставленные задачи не покидают индекс, поэтому следующий вызов начинается после них
+        offset = 0
+        while True:
+            reply = self._cleanup_tasks(
+                keys=[CREATED_INDEX_KEY, QUEUE_INDEX_KEY, STATS_KEY],
+                args=[timestamp, batch, offset, *status_args]
+            )
+            scanned, kept, removed = reply[0], reply[1], reply[2:]
+            for task_id in removed:
+                _forget_task(task_id.decode('utf-8'))
+            deleted += len(removed)
+            offset += kept
+            if scanned < batch:
+                return deleted
+
+    def ensure_legacy_migrated(self) -> None:
+        """
+        Run migrate_legacy_keys once per Redis database
+        """
+        if self.redis and not self.redis.exists(LEGACY_MIGRATION_KEY):
+            self.migrate_legacy_keys()
+
+    def migrate_legacy_keys(self) -> int:
+        """
+        Convert keys written by the old storage format
+        
+        Tasks stored as JSON strings (SET task:<id>) become hashes; the newer
+        copy from the old "tasks" hash is preferred when present. Logs stored
+        as lists (LPUSH task_log:<id>, newest first) become streams. If
+        anything was converted, statistics and the creation-time index are
+        rebuilt on next use so that they include the converted tasks.
+        
+        Returns:
+            int: Number of converted keys
+        """
+        converted = 0
+        for keys in self._scan_task_keys(match="task:*", key_type="STRING"):
+            for key in keys:
+                task_id = key.decode('utf-8')[len("task:"):]
+                data = self.redis.hget(LEGACY_TASKS_KEY, task_id) if self.redis.type(LEGACY_TASKS_KEY) == b"hash" else None
+                data = data or self.redis.get(key)
+                if data is None:
+                    continue
+                task = _loads(data)
+                task["task_id"] = task_id
+                task["version"] = task.get("version") or 1
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.delete(key)
+                pipe.hset(key, mapping=_encode_fields(task))
+                pipe.execute()
+                _forget_task(task_id)
+                converted += 1
+        
+        for keys in self._scan_task_keys(match="task_log:*", key_type="LIST"):
+            for key in keys:
+                entries = self.redis.lrange(key, 0, -1)
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.delete(key)
+                # В списке новые записи шли первыми, в поток они добавляются по порядку
+                for raw in reversed(entries):
+                    log = _loads(raw)
+                    pipe.xadd(key, {
+                        "timestamp": log.get("timestamp") or 0,
+                        "level": log.get("level") or "INFO",
+                        "message": log.get("message") or "",
+                        "details": _dumps(log.get("details"))
+                    }, maxlen=LOG_MAX_ENTRIES, approximate=True)
+                pipe.execute()
+                converted += 1
+        
+        pipe = self.redis.pipeline(transaction=True)
+        if converted:
+            pipe.delete(STATS_MIGRATION_KEY, CREATED_INDEX_MIGRATION_KEY)
+        pipe.set(LEGACY_MIGRATION_KEY, 1)
+        pipe.execute()
+        logger.info(f"Converted {converted} keys of the old task storage format")
+        return converted
+
+    def rebuild_created_index(self) -> None:
+        """
+        Fill the creation-time index from the stored tasks
+        """
+        for keys in self._scan_task_keys():
+            tasks = list(self._read_task_fields(keys, ["task_id", "created_at"]))
+            mapping = {task["task_id"]: task["created_at"] or 0 for task in tasks}
+            if mapping:
+                self.redis.zadd(CREATED_INDEX_KEY, mapping)
+        self.redis.set(CREATED_INDEX_MIGRATION_KEY, 1, nx=True)
+
+    def rebuild_stats(self) -> None:
+        """
+        Recompute the statistics hash from the stored tasks
+        
+        Only the fields the statistics depend on are read.
+        """
+        counts = {f"count:{status}": 0 for status in TASK_STATUSES}
+        sums = {"wait_sum": 0.0, "wait_count": 0, "execution_sum": 0.0, "execution_count": 0}
+        
+        for task in self.iter_tasks(fields=["status", "created_at", "started_at", "execution_duration"]):
+            if f"count:{task['status']}" in counts:
+                counts[f"count:{task['status']}"] += 1
+            if task["created_at"] and task["started_at"]:
+                sums["wait_sum"] += task["started_at"] - task["created_at"]
+                sums["wait_count"] += 1
+            if task["execution_duration"]:
+                sums["execution_sum"] += task["execution_duration"]
+                sums["execution_count"] += 1
+        
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(STATS_KEY)
+        pipe.hset(STATS_KEY, mapping={**counts, **sums})
+        pipe.set(STATS_MIGRATION_KEY, 1, nx=True)
+        pipe.execute()
+        logger.info(f"Queue statistics rebuilt: {counts}")
+    
     async def cleanup(self):
         """
-        Cleanup method for backward compatibility
+        Flush buffered task logs on shutdown
         """
-        logger.info("Cleanup is now a noop method")
-        pass
\ No newline at end of file
+        self.flush_logs()
\ No newline at end of file
@@ -1,38 +1,60 @@
 """
 Celery worker for background tasks
 """
-from celery import Celery
 import logging
 import os
 import time
-import json
+import threading
 from typing import Dict, Any, Optional
+from celery.signals import worker_ready, worker_shutdown
 from app.core.config import settings
-from app.core.queue import JobQueue
-from app.services.forecasting.training import train_model
-from app.services.forecasting.prediction import make_prediction
+from app.core.queue import JobQueue, celery_app, QUEUE_POP_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
 # Initialize Celery app - экспортируем как app для корректного импорта из командной строки
-app = Celery('tasks')
+# (используется то же приложение, что и в очереди, а не второй экземпляр Celery)
+app = celery_app
 app.conf.broker_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0"
-app.conf.result_backend = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0"
+# Результаты задач хранятся в очереди (JobQueue.complete_task), бэкенд результатов Celery не нужен
+app.conf.task_ignore_result = True
 
 # Настройка повторных попыток при ошибках
 app.conf.task_acks_late = True  # Подтверждать задачи только после успешного выполнения
 app.conf.task_reject_on_worker_lost = True  # Возвращать задачу в очередь при потере воркера
 app.conf.worker_prefetch_multiplier = 1  # Получать только одну задачу за раз
+# Короткие служебные задачи и долгие задачи обучения/прогноза - в разных очередях,
+# чтобы их можно было обслуживать разными воркерами с разным prefetch
+app.conf.task_routes = {
+    "process_task": {"queue": "compute"},
+    "process_queue": {"queue": "control"},
+    "cleanup_old_tasks": {"queue": "control"},
+}
+app.conf.broker_pool_limit = settings.REDIS_MAX_CONNECTIONS  # Размер пула соединений с брокером
 
 # Инициализация очереди
 queue = JobQueue()
 
+# Событие остановки диспетчера очереди
+_dispatcher_stop = threading.Event()
+
+# Диспетчер работает только в воркере, обслуживающем эту очередь Celery (worker-control)
+DISPATCHER_QUEUE = "control"
+# Пауза диспетчера (секунды), пока все места воркера вычислений заняты
+DISPATCH_BUSY_INTERVAL = 1.0
+# Как часто (секунды) диспетчер возвращает в очередь задачи, не запущенные в срок
+CLAIM_REAP_INTERVAL = 30.0
+
+# Минимальный интервал (секунды) между одинаковыми обновлениями прогресса обучения
+PROGRESS_MIN_INTERVAL = 0.5
+
 @app.task(
     name="process_task",
     bind=True,
     autoretry_for=(Exception,),
     retry_backoff=True,
-    retry_kwargs={"max_retries": 3}
+    retry_kwargs={"max_retries": 3},
+    ignore_result=True
 )
 def process_task(self, task_id: str):
     """
@@ -42,11 +64,12 @@ def process_task(self, task_id: str):
         task_id: Идентификатор задачи
     """
     try:
-        # Получаем информацию о задаче
-        task = queue.get_task(task_id)
+        # Задача переводится в executing только сейчас, когда воркер
+        # действительно начинает ее выполнение
+        task = queue.start_task(task_id)
         
         if not task:
-            logger.error(f"Задача с ID {task_id} не найдена")
+            logger.error(f"Задача с ID {task_id} не найдена или снова стоит в очереди")
             return
         
         logger.info(f"Обработка задачи {task_id} (тип: {task.get('task_type')})")
@@ -58,9 +81,9 @@ def process_task(self, task_id: str):
         result = None
         
         # Устанавливаем время начала выполнения, если его еще нет
+        # (записывается только поле start_time, а не вся задача)
         if not task.get("start_time"):
-            task["start_time"] = time.time()
-            queue.redis.hset("tasks", task_id, json.dumps(task))
+            queue.mark_started(task_id)
         
         # Обновляем прогресс до 10%
         queue.update_task_progress(task_id, 10, "Подготовка к выполнению")
@@ -74,13 +97,27 @@ def process_task(self, task_id: str):
             # Виртуальный прогресс, если обучение долгое
             start_time = time.time()
             
+            # Последние отправленные прогресс, этап и время отправки
+            last_sent = {"progress": -1, "stage": None, "time": 0.0}
+            
             # Запуск обучения с передачей функции обратного вызова для обновления прогресса
             def progress_callback(progress, stage=None):
                 # Ограничиваем прогресс от 20% до 90%
                 scaled_progress = int(20 + progress * 0.7)
-                queue.update_task_progress(task_id, scaled_progress, stage)
+                now = time.time()
+                # Частые события без изменения прогресса и этапа пропускаются
+                if (scaled_progress == last_sent["progress"] and stage == last_sent["stage"]
+                        and now - last_sent["time"] < PROGRESS_MIN_INTERVAL):
+                    return
+                last_sent.update(progress=scaled_progress, stage=stage, time=now)
+                
+                # Промежуточный прогресс отправляется в фоне, обучение не ждет Redis
+                queue.update_task_progress(task_id, scaled_progress, stage, wait=False)
                 queue.add_task_log(task_id, "INFO", f"Обучение: {progress:.1f}% завершено, этап: {stage or 'основной'}")
             
+            # Тяжелые модули прогнозирования (autogluon и др.) загружаются только
+            # при первой задаче этого типа; повторный импорт берется из sys.modules
+            from app.services.forecasting.training import train_model
             result = train_model(params, progress_callback=progress_callback)
             
             # Обновляем прогресс
@@ -95,6 +132,7 @@ def process_task(self, task_id: str):
             queue.add_task_log(task_id, "INFO", f"Загрузка модели {params.get('model_id', 'не указана')}")
             
             # Запуск прогнозирования
+            from app.services.forecasting.prediction import make_prediction
             result = make_prediction(params)
             
             queue.update_task_progress(task_id, 90, "Обработка результатов")
@@ -130,45 +168,115 @@ def process_task(self, task_id: str):
         # Генерируем исключение для повторной попытки через Celery
         raise self.retry(exc=e)
 
-@app.task(name="process_queue")
+@app.task(name="process_queue", ignore_result=True)
 def process_queue():
     """
     Проверяет очередь и запускает обработку задач
     """
     try:
-        # Получаем следующую задачу
-        task = queue.get_next_task()
+        if queue.active_task_count() < settings.COMPUTE_CONCURRENCY:
+            hand_off_next_task(timeout=0)
+    except Exception as e:
+        logger.error(f"Ошибка при проверке очереди: {str(e)}")
+
+
+def hand_off_next_task(timeout: int = QUEUE_POP_TIMEOUT) -> Optional[str]:
+    """
+    Передает следующую задачу очереди в process_task
+    
+    Задача извлекается в список извлеченных (claim_next_task) и остается
+    в состоянии pending до начала выполнения. Если передать ее в Celery
+    не удалось, она сразу возвращается в голову очереди.
+    
+    Args:
+        timeout: Сколько секунд ждать появления задачи
         
-        if task:
-            task_id = task.get("task_id")
-            logger.info(f"Запуск обработки задачи {task_id}")
+    Returns:
+        Идентификатор переданной задачи или None, если очередь пуста
+    """
+    task_id = queue.claim_next_task(timeout=timeout)
+    if not task_id:
+        return None
+    
+    logger.info(f"Передача задачи {task_id} на выполнение")
+    try:
+        process_task.delay(task_id)
+    except Exception:
+        queue.release_task(task_id)
+        raise
+    return task_id
+
+
+def dispatch_queue(stop: threading.Event) -> None:
+    """
+    Непрерывно передает задачи из очереди в process_task
+    
+    Задача берется, только когда у воркера вычислений есть свободное место
+    (settings.COMPUTE_CONCURRENCY), поэтому остальные задачи ждут в очереди,
+    а не в брокере, и их позиции и статистика остаются верными.
+    claim_next_task блокируется на стороне Redis (BLMOVE) до появления задачи,
+    поэтому свободный воркер получает ее сразу, без опроса.
+    Задачи, не запущенные в срок, периодически возвращаются в очередь.
+    
+    Args:
+        stop: Событие остановки диспетчера
+    """
+    last_reap = 0.0
+    while not stop.is_set():
+        try:
+            if time.monotonic() - last_reap >= CLAIM_REAP_INTERVAL:
+                last_reap = time.monotonic()
+                requeued = queue.requeue_expired_claims()
+                if requeued:
+                    logger.warning(f"Возвращены в очередь задачи, не запущенные в срок: {requeued}")
+            
+            if queue.active_task_count() >= settings.COMPUTE_CONCURRENCY:
+                stop.wait(DISPATCH_BUSY_INTERVAL)
+                continue
             
-            # Запускаем обработку задачи
-            process_task.delay(task_id)
+            hand_off_next_task(timeout=QUEUE_POP_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Ошибка при получении задачи из очереди: {str(e)}")
+            # Пауза, чтобы не нагружать недоступный Redis
+            stop.wait(1)
+
+
+@worker_ready.connect
+def start_dispatcher(sender=None, **kwargs):
+    """
+    Запуск диспетчера очереди в фоновом потоке при старте воркера
     
-    except Exception as e:
-        logger.error(f"Ошибка при проверке очереди: {str(e)}")
+    Сигнал приходит во всех воркерах, а диспетчер должен быть один:
+    он запускается только в воркере, обслуживающем DISPATCHER_QUEUE.
+    """
+    consumed = sender.app.amqp.queues.consume_from if sender is not None else {}
+    if DISPATCHER_QUEUE not in consumed:
+        return
+    # Ключи старого формата преобразуются до выдачи первой задачи
+    queue.ensure_legacy_migrated()
+    thread = threading.Thread(target=dispatch_queue, args=(_dispatcher_stop,), name="queue-dispatcher", daemon=True)
+    thread.start()
+
+
+@worker_shutdown.connect
+def stop_dispatcher(sender=None, **kwargs):
+    """
+    Остановка диспетчера очереди при завершении воркера
+    """
+    _dispatcher_stop.set()
 
 
-@app.task(name="cleanup_old_tasks")
+@app.task(name="cleanup_old_tasks", ignore_result=True)
 def cleanup_old_tasks():
     """
     Очистка старых задач из системы (старше 30 дней)
     """
     try:
-        all_tasks = queue.get_all_tasks()
         current_time = time.time()
         cleanup_threshold = current_time - (30 * 24 * 3600)  # 30 дней
         
-        deleted_count = 0
-        for task in all_tasks:
-            created_at = task.get("created_at", 0)
-            if created_at < cleanup_threshold and task.get("status") in ["completed", "failed"]:
-                # Удаляем задачу из Redis
-                queue.redis.hdel("tasks", task["task_id"])
-                # Удаляем логи задачи
-                queue.redis.delete(f"task_log:{task['task_id']}")
-                deleted_count += 1
+        # Отбор и удаление выполняются скриптом на стороне Redis по индексу времени создания
+        deleted_count = queue.delete_tasks_created_before(cleanup_threshold, ["completed", "failed"])
         
         if deleted_count > 0:
             logger.info(f"Очищено {deleted_count} старых задач")
@@ -182,8 +290,7 @@ def setup_periodic_tasks(sender, **kwargs):
     """
     Настройка периодических задач
     """
-    # Проверка очереди каждые 10 секунд
-    sender.add_periodic_task(10.0, process_queue.s(), name='check_queue_every_10s')
+    # Очередь обрабатывает диспетчер (dispatch_queue), периодический опрос не нужен
     
     # Очистка старых задач раз в день
     sender.add_periodic_task(
@@ -2,14 +2,67 @@
 Функции для очистки данных из базы данных
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 import logging
 from app.core.database import USE_MEMORY_DB
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Таблицы, в которых могут быть данные пользователя.
+# Обновите этот список в соответствии с вашей схемой БД
+USER_DATA_TABLES = [
+    "forecast_results",
+    "time_series_data",
+    "forecast_jobs",
+    "uploaded_files",
+]
+
+# Столбцы существующих таблиц из списка (схема читается один раз на процесс)
+_table_columns: Optional[Dict[str, Set[str]]] = None
+
+
+def _get_table_columns(db: Session) -> Dict[str, Set[str]]:
+    """
+    Возвращает столбцы существующих в базе данных таблиц из USER_DATA_TABLES
+    
+    Args:
+        db: Сессия базы данных
+        
+    Returns:
+        Dict[str, Set[str]]: Имена столбцов по именам таблиц
+    """
+    global _table_columns
+    if _table_columns is None:
+        # Inspector использует соединение текущей транзакции сессии
+        inspector = inspect(db.connection())
+        existing = set(inspector.get_table_names())
+        _table_columns = {
+            table: {column["name"] for column in inspector.get_columns(table)}
+            for table in USER_DATA_TABLES
+            if table in existing
+        }
+    return _table_columns
+
+
+def _build_delete_query(tables: List[str]) -> str:
+    """
+    Строит один запрос удаления данных пользователя из нескольких таблиц
+    
+    Args:
+        tables: Таблицы из USER_DATA_TABLES со столбцом user_id
+        
+    Returns:
+        str: SQL-запрос, возвращающий общее количество удаленных строк
+    """
+    ctes = ", ".join(
+        f"d{i} AS (DELETE FROM {table} WHERE user_id = :user_id RETURNING 1)"
+        for i, table in enumerate(tables)
+    )
+    total = " + ".join(f"(SELECT count(*) FROM d{i})" for i in range(len(tables)))
+    return f"WITH {ctes} SELECT {total}"
+
 def cleanup_user_data(db: Session, user_id: Optional[str] = None) -> bool:
     """
     Очищает данные пользователя из базы данных
@@ -22,47 +75,33 @@ def cleanup_user_data(db: Session, user_id: Optional[str] = None) -> bool:
         bool: True если данные успешно очищены, False в противном случае
     """
     try:
-        # Список таблиц, в которых могут быть данные пользователя
-        # Обновите этот список в соответствии с вашей схемой БД
-        tables = [
-            "forecast_results",
-            "time_series_data",
-            "forecast_jobs",
-            "uploaded_files"
-        ]
-        
         # Если используем БД в памяти, просто пропускаем очистку
         if USE_MEMORY_DB:
             logger.info("Используется БД в памяти, данные будут очищены автоматически после перезапуска")
             return True
         
         with db.begin():
-            for table in tables:
-                # Проверяем существование таблицы
-                table_exists = db.execute(
-                    text(f"SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = '{table}')")
-                ).scalar()
-                
-                if not table_exists:
+            table_columns = _get_table_columns(db)
+            
+            # Имена таблиц подставляются в SQL только из статического списка,
+            # значения передаются параметрами
+            tables = []
+            for table in USER_DATA_TABLES:
+                if table not in table_columns:
                     logger.warning(f"Таблица {table} не существует, пропускаем")
-                    continue
-                
-                # Строим запрос на удаление
-                if user_id:
-                    # Проверяем наличие column user_id
-                    column_exists = db.execute(
-                        text(f"SELECT EXISTS (SELECT FROM information_schema.columns WHERE table_name = '{table}' AND column_name = 'user_id')")
-                    ).scalar()
-                    
-                    if column_exists:
-                        db.execute(text(f"DELETE FROM {table} WHERE user_id = :user_id"), {"user_id": user_id})
-                        logger.info(f"Очищены данные пользователя {user_id} из таблицы {table}")
-                    else:
-                        logger.warning(f"Таблица {table} не имеет столбца user_id, пропускаем")
+                elif user_id and "user_id" not in table_columns[table]:
+                    logger.warning(f"Таблица {table} не имеет столбца user_id, пропускаем")
                 else:
-                    # Очищаем всю таблицу
-                    db.execute(text(f"TRUNCATE TABLE {table} CASCADE"))
-                    logger.info(f"Очищена вся таблица {table}")
+                    tables.append(table)
+            
+            if tables and user_id:
+                # Все удаления выполняются одним запросом (цепочка CTE)
+                deleted = db.execute(text(_build_delete_query(tables)), {"user_id": user_id}).scalar()
+                logger.info(f"Очищены данные пользователя {user_id} из таблиц {', '.join(tables)} (строк: {deleted})")
+            elif tables:
+                # Очищаем все таблицы одной командой
+                db.execute(text(f"TRUNCATE TABLE {', '.join(tables)} CASCADE"))
+                logger.info(f"Очищены таблицы {', '.join(tables)}")
         
         db.commit()
         return True
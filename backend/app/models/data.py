@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 
 
@@ -6,7 +6,8 @@ class DatasetInfo(BaseModel):
     """Информация о датасете"""
     rows: int = Field(..., description="Количество строк")
     columns: int = Field(..., description="Количество столбцов")
-    column_names: List[str] = Field(..., description="Имена столбцов")
+    # Кортеж вместо списка: неизменяемый, в JSON по-прежнему массив
+    column_names: Tuple[str, ...] = Field(..., description="Имена столбцов")
     missing_values: Dict[str, int] = Field(..., description="Пропущенные значения по столбцам")
 
 
@@ -39,5 +40,6 @@ class DataAnalysisResponse(BaseModel):
     success: bool = Field(..., description="Успешность анализа")
     message: str = Field(..., description="Сообщение о результате")
     analysis_id: Optional[str] = Field(None, description="Идентификатор анализа")
-    results: Optional[Dict[str, Any]] = Field(None, description="Результаты анализа")
-    plots: Optional[Dict[str, Any]] = Field(None, description="Данные для построения графиков")
\ No newline at end of file
+    # Any вместо Dict[str, Any]: большие словари результатов не обходятся валидатором
+    results: Optional[Any] = Field(None, description="Результаты анализа")
+    plots: Optional[Any] = Field(None, description="Данные для построения графиков")
\ No newline at end of file
@@ -25,9 +25,9 @@ class Dataset:
     # Column information
     date_column: Optional[str] = None  # Name of the datetime column
     target_column: Optional[str] = None  # Name of the target column
-    feature_columns: str = "[]"  # JSON string of feature column names
-    categorical_columns: str = "[]"  # JSON string of categorical column names
-    numeric_columns: str = "[]"  # JSON string of numeric column names
+    feature_columns: List[str] = field(default_factory=list)  # Feature column names
+    categorical_columns: List[str] = field(default_factory=list)  # Categorical column names
+    numeric_columns: List[str] = field(default_factory=list)  # Numeric column names
     
     # Statistics
     statistics: Dict[str, Any] = field(default_factory=dict)  # Dict with basic statistics (min, max, mean, etc.)
@@ -58,4 +58,6 @@ class DatasetPreprocessing:
 
 # Global in-memory storage
 datasets = {}
-preprocessings = {}
\ No newline at end of file
+preprocessings = {}
+# Index of preprocessing IDs by dataset ID
+preprocessings_by_dataset: Dict[str, List[str]] = {}
\ No newline at end of file
@@ -25,5 +25,6 @@ class PredictionResponse(BaseModel):
 class PredictionResult(BaseModel):
     """Результаты прогнозирования"""
     prediction_id: str = Field(..., description="Идентификатор прогноза")
-    predictions: Dict[str, Any] = Field(..., description="Предсказанные значения")
-    plots: Optional[Dict[str, Any]] = Field(None, description="Данные для построения графиков")
\ No newline at end of file
+    # Any вместо Dict[str, Any]: большие словари результатов не обходятся валидатором
+    predictions: Any = Field(..., description="Предсказанные значения")
+    plots: Optional[Any] = Field(None, description="Данные для построения графиков")
\ No newline at end of file
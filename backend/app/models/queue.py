@@ -1,5 +1,5 @@
 from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 
 class TaskCreate(BaseModel):
@@ -11,6 +11,9 @@ class TaskCreate(BaseModel):
 
 class TaskStatus(BaseModel):
     """Статус задачи"""
+    # Неизменяемые модели ответа: создаются один раз и только сериализуются
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     task_id: str = Field(..., description="Идентификатор задачи")
     status: str = Field(..., description="Статус задачи (pending, executing, completed, failed)")
     position: int = Field(..., description="Позиция в очереди (0 = выполняется или завершена)")
@@ -18,7 +21,8 @@ class TaskStatus(BaseModel):
     created_at: float = Field(..., description="Время создания (UNIX timestamp)")
     updated_at: float = Field(..., description="Время обновления (UNIX timestamp)")
     estimated_end_time: Optional[float] = Field(None, description="Оценка времени завершения (UNIX timestamp)")
-    result: Optional[Dict[str, Any]] = Field(None, description="Результат выполнения (если завершена)")
+    # Any вместо Dict[str, Any]: результат уже сформирован воркером, глубокая валидация не нужна
+    result: Optional[Any] = Field(None, description="Результат выполнения (если завершена)")
     error: Optional[str] = Field(None, description="Сообщение об ошибке (если не удалось)")
     stage: Optional[str] = Field(None, description="Текущий этап выполнения")
     retry_count: Optional[int] = Field(0, description="Количество попыток выполнения")
@@ -26,6 +30,8 @@ class TaskStatus(BaseModel):
 
 class QueueInfo(BaseModel):
     """Информация об очереди"""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     total_tasks: int = Field(..., description="Общее количество задач")
     pending_tasks: int = Field(..., description="Количество ожидающих задач")
     executing_tasks: int = Field(..., description="Количество выполняемых задач")
@@ -33,13 +39,25 @@ class QueueInfo(BaseModel):
     failed_tasks: int = Field(..., description="Количество проваленных задач")
     average_waiting_time: Optional[float] = Field(None, description="Среднее время ожидания (сек)")
     average_execution_time: Optional[float] = Field(None, description="Среднее время выполнения (сек)")
-    tasks: List[TaskStatus] = Field(..., description="Список всех задач")
+    tasks: List[TaskStatus] = Field(default_factory=list, description="Страница задач (сначала новые)")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None, если страница последняя)")
 
 
 class TaskLog(BaseModel):
     """Запись лога выполнения задачи"""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     task_id: str = Field(..., description="Идентификатор задачи")
     timestamp: float = Field(..., description="Время записи (UNIX timestamp)")
     level: str = Field("INFO", description="Уровень лога (INFO, WARNING, ERROR)")
     message: str = Field(..., description="Сообщение лога")
-    details: Optional[Dict[str, Any]] = Field(None, description="Дополнительная информация")
\ No newline at end of file
+    details: Optional[Dict[str, Any]] = Field(None, description="Дополнительная информация")
+
+
+# Сериализатор списка логов строится один раз при импорте, а не на каждый запрос
+TASK_LOG_LIST_ADAPTER = TypeAdapter(List[TaskLog])
+
+
+def dump_task_logs(logs: List[TaskLog]) -> bytes:
+    """Сериализация списка логов задачи в JSON"""
+    return TASK_LOG_LIST_ADAPTER.dump_json(logs)
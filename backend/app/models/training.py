@@ -1,5 +1,5 @@
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class TrainingParams(BaseModel):
@@ -34,9 +34,12 @@ class TrainingResponse(BaseModel):
 
 class TrainingResult(BaseModel):
     """Результаты обучения модели"""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     model_id: str = Field(..., description="Идентификатор модели")
     best_model: str = Field(..., description="Лучшая модель")
     best_score: float = Field(..., description="Лучшая оценка")
-    leaderboard: List[Dict[str, Any]] = Field(..., description="Таблица результатов")
-    fit_summary: Dict[str, Any] = Field(..., description="Сводка по обучению")
-    weighted_ensemble_info: Optional[Dict[str, Any]] = Field(None, description="Информация о взвешенном ансамбле")
\ No newline at end of file
+    # Any вместо Dict[str, Any]: большие словари результатов не обходятся валидатором
+    leaderboard: List[Any] = Field(..., description="Таблица результатов")
+    fit_summary: Any = Field(..., description="Сводка по обучению")
+    weighted_ensemble_info: Optional[Any] = Field(None, description="Информация о взвешенном ансамбле")
\ No newline at end of file
@@ -1,15 +1,150 @@
 """
 Service for time series statistical analysis
 """
+import copy
+import functools
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 from typing import Dict, Any, List, Optional
-from statsmodels.tsa.seasonal import seasonal_decompose
-from scipy import stats
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Максимальный период сезонной декомпозиции: ее стоимость растет как O(N * period)
+MAX_SEASONAL_PERIOD = 1000
+
+# Количество результатов анализа в кеше процесса
+ANALYSIS_CACHE_SIZE = 64
+
+# Кеш результатов анализа: (отпечаток данных, метод, аргументы) -> результат
+_analysis_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+
+def _cached(method):
+    """
+    Memoize an analyzer method by the data fingerprint and the call arguments
+    
+    Every caller gets its own deep copy, so changing a returned result
+    in place does not affect later calls with the same fingerprint.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (self.fingerprint(), method.__name__, args, tuple(sorted(kwargs.items())))
+        with _analysis_cache_lock:
+            cached = _analysis_cache.get(key)
+            if cached is not None:
+                _analysis_cache.move_to_end(key)
+        # Закешированный объект никто не изменяет, поэтому копия делается без блокировки
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        result = method(self, *args, **kwargs)
+        cached = copy.deepcopy(result)
+        with _analysis_cache_lock:
+            _analysis_cache[key] = cached
+            if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                _analysis_cache.popitem(last=False)
+        return result
+    return wrapper
+
+
+def _to_json_list(values: np.ndarray) -> List[Optional[float]]:
+    """
+    Convert a numeric array to a JSON-compatible list (NaN becomes None)
+    """
+    array = np.asarray(values, dtype=np.float64)
+    mask = np.isnan(array)
+    if not mask.any():
+        return array.tolist()
+    return np.where(mask, None, array).tolist()
+
+
+DecomposeResult = namedtuple("DecomposeResult", ["trend", "seasonal", "resid"])
+
+
+def _centered_moving_average(y: np.ndarray, period: int) -> np.ndarray:
+    """
+    Centered moving average of the given period (2xP average for even periods)
+    
+    Args:
+        y: Series values
+        period: Seasonal period
+        
+    Returns:
+        Trend array of the same length as y, NaN where the window is incomplete
+    """
+    # Окна без копирования данных: (N - period + 1, period)
+    window_means = sliding_window_view(y, period).mean(axis=-1)
+    if period % 2 == 0:
+        # 2xP среднее: усредняем два соседних окна, как фильтр statsmodels
+        window_means = (window_means[:-1] + window_means[1:]) / 2
+    
+    half = period // 2
+    trend = np.full_like(y, np.nan)
+    trend[half:half + len(window_means)] = window_means
+    return trend
+
+
+def _extrapolate_trend(trend: np.ndarray, npoints: int) -> np.ndarray:
+    """
+    Fill NaN trend ends with least-squares lines fitted on the npoints closest values
+    
+    Args:
+        trend: Trend with NaN at both ends
+        npoints: Number of defined points used for each fit
+        
+    Returns:
+        The same array with the ends filled in
+    """
+    defined = np.flatnonzero(~np.isnan(trend))
+    front, back = defined[0], defined[-1]
+    if front == 0 and back == len(trend) - 1:
+        return trend
+    
+    x = np.arange(front, min(front + npoints, back))
+    slope, intercept = np.polyfit(x, trend[x], 1)
+    trend[:front] = slope * np.arange(front) + intercept
+    
+    x = np.arange(max(front, back - npoints), back)
+    slope, intercept = np.polyfit(x, trend[x], 1)
+    trend[back + 1:] = slope * np.arange(back + 1, len(trend)) + intercept
+    return trend
+
+
+def _decompose(y: np.ndarray, period: int) -> DecomposeResult:
+    """
+    Additive moving-average decomposition, same as statsmodels
+    seasonal_decompose(period=period, extrapolate_trend='freq')
+    
+    Args:
+        y: Series values without missing values
+        period: Seasonal period
+        
+    Returns:
+        DecomposeResult with trend, seasonal and resid arrays
+    """
+    if not np.all(np.isfinite(y)):
+        raise ValueError("Seasonal decomposition does not handle missing values")
+    
+    n = len(y)
+    trend = _extrapolate_trend(_centered_moving_average(y, period), period)
+    detrended = y - trend
+    
+    # Средние по фазам сезона: дополняем ряд NaN до целого числа периодов
+    padded = np.full(-(-n // period) * period, np.nan)
+    padded[:n] = detrended
+    period_averages = np.nanmean(padded.reshape(-1, period), axis=0)
+    period_averages -= period_averages.mean()
+    
+    seasonal = np.resize(period_averages, n)
+    return DecomposeResult(trend, seasonal, detrended - seasonal)
+
+
 class TimeSeriesAnalyzer:
     def __init__(self, data: pd.DataFrame, date_column: str, value_column: str):
         """
@@ -28,53 +163,106 @@ class TimeSeriesAnalyzer:
         self.data[date_column] = pd.to_datetime(self.data[date_column])
         # Sort by date
         self.data = self.data.sort_values(date_column)
+        self._fingerprint: Optional[tuple] = None
+
+    def fingerprint(self) -> tuple:
+        """
+        Key identifying the analyzed series, used to cache analysis results
+        
+        Returns:
+            Tuple of the column names, the length and a hash of the date and value columns
+        """
+        if self._fingerprint is None:
+            hashes = pd.util.hash_pandas_object(self.data[[self.date_column, self.value_column]], index=False)
+            digest = hashlib.blake2b(hashes.to_numpy().tobytes(), digest_size=16).hexdigest()
+            self._fingerprint = (self.date_column, self.value_column, len(self.data), digest)
+        return self._fingerprint
 
+    @_cached
     def get_basic_statistics(self) -> Dict[str, float]:
         """
         Calculate basic statistics of the time series
         """
-        values = self.data[self.value_column]
-        return {
-            "mean": float(values.mean()),
-            "median": float(values.median()),
-            "std": float(values.std()),
-            "min": float(values.min()),
-            "max": float(values.max()),
-            "missing_values": int(values.isnull().sum()),
-            "skewness": float(stats.skew(values.dropna())),
-            "kurtosis": float(stats.kurtosis(values.dropna())),
-            "range": float(values.max() - values.min())
-        }
-
-    def detect_anomalies(self, threshold: float = 3.0) -> List[Dict[str, Any]]:
+        values = self.data[self.value_column].to_numpy(dtype=np.float64)
+        # Пропуски отбрасываются один раз, дальше все считается по одному массиву
+        valid = values[~np.isnan(values)]
+        n = len(valid)
+        if n == 0:
+            return {
+                "mean": np.nan, "median": np.nan, "std": np.nan, "min": np.nan, "max": np.nan,
+                "missing_values": len(values), "skewness": np.nan, "kurtosis": np.nan, "range": np.nan
+            }
+        
+        mean = valid.mean()
+        # Центральные моменты через скалярные произведения, без промежуточных Series
+        deviations = valid - mean
+        squared = deviations * deviations
+        m2 = squared.sum() / n
+        m3 = np.dot(squared, deviations) / n
+        m4 = np.dot(squared, squared) / n
+        minimum, maximum = valid.min(), valid.max()
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {
+                "mean": float(mean),
+                "median": float(np.median(valid)),
+                # Несмещенное отклонение (ddof=1), как в pandas
+                "std": float(np.sqrt(m2 * n / (n - 1))) if n > 1 else np.nan,
+                "min": float(minimum),
+                "max": float(maximum),
+                "missing_values": len(values) - n,
+                # Смещенные оценки, как scipy.stats.skew и scipy.stats.kurtosis по умолчанию
+                "skewness": float(m3 / m2 ** 1.5),
+                "kurtosis": float(m4 / m2 ** 2 - 3.0),
+                "range": float(maximum - minimum)
+            }
+
+    @_cached
+    def detect_anomalies(self, threshold: float = 3.0, method: str = "modified") -> List[Dict[str, Any]]:
         """
         Detect anomalies using Z-score method
         
+        The modified Z-score 0.6745 * (x - median) / MAD is used by default:
+        unlike the mean and standard deviation, the median and MAD are not
+        skewed by the anomalies themselves.
+        
         Args:
             threshold: Z-score threshold for anomaly detection
+            method: "modified" (median and MAD) or "zscore" (mean and standard deviation)
             
         Returns:
             List of anomalies with dates and values
         """
-        values = self.data[self.value_column]
-        dates = self.data[self.date_column]
+        if method not in ("modified", "zscore"):
+            raise ValueError(f"Unknown anomaly detection method: {method}")
         
-        # Calculate Z-scores
-        z_scores = stats.zscore(values)
+        values = self.data[self.value_column].to_numpy(dtype=np.float64)
         
-        # Find anomalies
-        anomalies = []
-        for date, value, zscore in zip(dates, values, z_scores):
-            if abs(zscore) > threshold:
-                anomalies.append({
-                    "date": date.isoformat(),
-                    "value": float(value),
-                    "zscore": float(zscore),
-                    "type": "high" if zscore > 0 else "low"
-                })
+        # Calculate Z-scores (пропуски не учитываются)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            median = np.nanmedian(values)
+            mad = np.nanmedian(np.abs(values - median))
+            if method == "modified" and mad > 0:
+                z_scores = 0.6745 * (values - median) / mad
+            else:
+                # MAD = 0, если больше половины значений совпадают; тогда используется обычная Z-оценка
+                z_scores = (values - np.nanmean(values)) / np.nanstd(values)
         
-        return anomalies
+        # Find anomalies: индексы выбираются маской, в Python обходятся только аномалии
+        anomaly_idx = np.flatnonzero(np.abs(z_scores) > threshold)
+        dates = self.data[self.date_column].iloc[anomaly_idx]
+        
+        return [
+            {
+                "date": date.isoformat(),
+                "value": float(values[i]),
+                "zscore": float(z_scores[i]),
+                "type": "high" if z_scores[i] > 0 else "low"
+            }
+            for date, i in zip(dates, anomaly_idx)
+        ]
 
+    @_cached
     def analyze_seasonality(self, period: Optional[int] = None) -> Dict[str, Any]:
         """
         Analyze seasonality in the time series
@@ -98,11 +286,20 @@ class TimeSeriesAnalyzer:
                 else:
                     period = 7  # default to weekly
             
+            # Декомпозиция требует двух полных периодов; слишком длинные периоды не анализируются
+            if period > MAX_SEASONAL_PERIOD or len(self.data) < 2 * period:
+                logger.info(f"Seasonal decomposition skipped: period {period}, {len(self.data)} observations")
+                return {
+                    "main_period": period,
+                    "strength": 0.0,
+                    "trend_direction": "Неприменимо",
+                    "components": None
+                }
+            
             # Perform seasonal decomposition
-            decomposition = seasonal_decompose(
-                self.data[self.value_column],
-                period=period,
-                extrapolate_trend='freq'
+            decomposition = _decompose(
+                self.data[self.value_column].to_numpy(dtype=np.float64),
+                period
             )
             
             # Calculate seasonality strength
@@ -111,12 +308,12 @@ class TimeSeriesAnalyzer:
                 (np.var(decomposition.seasonal) + np.var(decomposition.resid))
             )
             
-            # Determine trend direction
-            trend_coefficient = np.polyfit(
-                range(len(decomposition.trend)),
-                decomposition.trend,
-                1
-            )[0]
+            # Determine trend direction: наклон МНК в замкнутой форме (нужен только его знак)
+            trend = decomposition.trend
+            x = np.arange(len(trend), dtype=np.float64)
+            mask = ~np.isnan(trend)
+            x_centered = x[mask] - x[mask].mean()
+            trend_coefficient = np.dot(x_centered, trend[mask]) / np.dot(x_centered, x_centered)
             
             trend_direction = (
                 "Возрастающий" if trend_coefficient > 0
@@ -124,19 +321,19 @@ class TimeSeriesAnalyzer:
                 else "Отсутствует"
             )
             
-            # Format components for frontend
-            components = pd.DataFrame({
-                'date': self.data[self.date_column],
-                'trend': decomposition.trend,
-                'seasonal': decomposition.seasonal,
-                'residual': decomposition.resid
-            })
+            # Format components for frontend: по столбцам, а не словарь на каждую строку
+            components = {
+                'date': self.data[self.date_column].dt.strftime('%Y-%m-%dT%H:%M:%S').tolist(),
+                'trend': _to_json_list(decomposition.trend),
+                'seasonal': _to_json_list(decomposition.seasonal),
+                'residual': _to_json_list(decomposition.resid)
+            }
             
             return {
                 "main_period": period,
                 "strength": float(seasonal_strength),
                 "trend_direction": trend_direction,
-                "components": components.to_dict(orient='records')
+                "components": components
             }
             
         except Exception as e:
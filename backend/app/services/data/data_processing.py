@@ -1,14 +1,65 @@
 import pandas as pd
 import numpy as np
 import os
+import csv
+import codecs
 import logging
 import traceback  # Добавляем для подробного логирования ошибок
-from typing import Tuple, Dict, Any, Optional, List
+from typing import Tuple, Dict, Any, Optional, List, BinaryIO
 from fastapi import HTTPException
 from app.models.data import DatasetInfo
+from app.core.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Без pyarrow большие CSV читаются чанками средствами pandas
+    pa = None
+    pa_csv = None
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_FAST_ENGINE: Optional[str] = 'calamine'
+except ImportError:  # Без python-calamine Excel читается через openpyxl / xlrd
+    EXCEL_FAST_ENGINE = None
 
 logger = logging.getLogger(__name__)
 
+# Кодировки, которые пробуются при чтении CSV (по порядку).
+# latin1 декодирует любые байты, поэтому проверяется последней
+CSV_ENCODINGS = ['utf-8', 'cp1251', 'latin1']
+# Размер образца для определения разделителя и кодировки (байт)
+CSV_SAMPLE_SIZE = 4096
+# Допустимые разделители CSV
+CSV_DELIMITERS = ',;\t|'
+# Оценка размера строки CSV: пакет pyarrow примерно соответствует чанку pandas
+CSV_BYTES_PER_ROW = 256
+# Прогресс чтения CSV логируется раз в столько чанков (пакетов)
+CSV_LOG_INTERVAL = 16
+# Размер блока pyarrow при чтении CSV целиком: блоки разбираются параллельно в потоках
+CSV_ARROW_BLOCK_SIZE = 8 << 20
+
+# Строковый столбец переводится в category, если доля уникальных значений меньше порога
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# item_id хранится как category, если рядов меньше четверти от числа строк
+ITEM_ID_CATEGORY_MAX_RATIO = 0.25
+
+# Типы Arrow -> nullable-типы pandas (как при dtype_backend='numpy_nullable')
+_ARROW_NULLABLE_TYPES = {
+    pa.int64(): pd.Int64Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+    pa.large_string(): pd.StringDtype(),
+} if pa is not None else {}
+
+# Ошибки чтения через pyarrow, после которых файл читается средствами pandas:
+# разбор (ArrowInvalid - подкласс ValueError), декодирование, а также
+# преобразование в pandas и последующая обработка столбцов
+_ARROW_CSV_FALLBACK_ERRORS = (
+    pa.ArrowException, UnicodeDecodeError, AttributeError, TypeError, ValueError
+) if pa is not None else ()
+
 def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.DataFrame, DatasetInfo]:
     """
     Обработка загруженного файла и извлечение информации о нем
@@ -21,12 +72,15 @@ def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.
         df: Загруженный и обработанный DataFrame
         info: Информация о датасете
     """
-    if not os.path.exists(file_path):
+    # Один вызов stat и для проверки существования, и для размера файла
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
         logger.error(f"Файл не найден: {file_path}")
         raise HTTPException(status_code=404, detail=f"Файл не найден: {file_path}")
     
     file_ext = os.path.splitext(file_path)[1].lower()
-    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    file_size_mb = file_stat.st_size / (1024 * 1024)
     
     logger.info(f"Обработка файла: {file_path} ({file_size_mb:.2f} МБ)")
     
@@ -41,8 +95,9 @@ def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.
             if file_size_mb > 100:
                 logger.warning("Большие Excel-файлы могут загружаться медленно")
             try:
-                # Попытка чтения с использованием openpyxl для xlsx или xlrd для xls
-                engine = 'openpyxl' if file_ext == '.xlsx' else 'xlrd'
+                # calamine (Rust) читает xls и xlsx быстрее и экономнее по памяти;
+                # без него - openpyxl для xlsx или xlrd для xls
+                engine = EXCEL_FAST_ENGINE or ('openpyxl' if file_ext == '.xlsx' else 'xlrd')
                 logger.info(f"Попытка чтения Excel-файла с использованием движка {engine}")
                 
                 # Проверяем поддержку pandas версии ≥ 2.0 с параметром dtype_backend
@@ -92,12 +147,19 @@ def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.
             logger.error("Загруженный файл должен содержать минимум 2 колонки")
             raise HTTPException(status_code=400, detail="Файл должен содержать минимум 2 колонки (дата и значение)")
         
-        # Создаем информацию о датасете без создания дополнительных копий данных
-        missing_values = {col: int(df[col].isna().sum()) for col in df.columns}
+        # Уменьшаем разрядность типов сразу после чтения: дальнейшие проходы по данным быстрее
+        df = downcast_dtypes(df)
+        
+        # Создаем информацию о датасете без создания дополнительных копий данных.
+        # Чтение чанками уже подсчитало пропуски, повторный проход не нужен
+        missing_values = df.attrs.pop('missing_values', None)
+        if missing_values is None:
+            # Один проход по блокам датафрейма вместо отдельной редукции на каждый столбец
+            missing_values = df.isna().sum().astype('int64').to_dict()
         info = DatasetInfo(
             rows=len(df),
             columns=len(df.columns),
-            column_names=df.columns.tolist(),
+            column_names=tuple(df.columns),
             missing_values=missing_values
         )
         
@@ -105,6 +167,9 @@ def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.
         
         return df, info
     
+    except HTTPException:
+        # Ошибки с уже выбранным статусом (400, 404) передаются как есть
+        raise
     except pd.errors.EmptyDataError:
         logger.error("Пустой CSV-файл или нет данных")
         raise HTTPException(status_code=400, detail="Файл пуст или не содержит данных")
@@ -122,50 +187,90 @@ def process_uploaded_file(file_path: str, chunk_size: int = 100000) -> Tuple[pd.
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки: {str(e)}")
 
 
+def _sniff_csv(f: BinaryIO) -> Tuple[str, str]:
+    """
+    Определение разделителя и кодировки CSV по образцу из начала файла
+    
+    После чтения образца файл возвращается в начало, чтобы тот же
+    дескриптор можно было сразу передать в pandas.
+    
+    Args:
+        f: Файл, открытый в двоичном режиме
+        
+    Returns:
+        sep: Разделитель
+        encoding: Кодировка
+    """
+    sample_bytes = f.read(CSV_SAMPLE_SIZE)
+    f.seek(0)
+    
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Инкрементальный декодер не считает ошибкой символ, обрезанный на границе образца
+            sample = codecs.getincrementaldecoder(encoding)().decode(sample_bytes, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    
+    # Последняя строка образца обычно обрезана и только мешает анализу
+    if '\n' in sample:
+        sample = sample[:sample.rfind('\n')]
+    
+    # csv.Sniffer учитывает кавычки и согласованность числа полей по строкам,
+    # поэтому запятые внутри значений не принимаются за разделитель
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        # Sniffer не справился: берем самый частый из допустимых символов,
+        # чтобы всегда оставаться на C-парсере
+        counts = {delimiter: sample.count(delimiter) for delimiter in CSV_DELIMITERS}
+        if not any(counts.values()):
+            # Без разделителя в файле одна колонка - такой файл не подходит, и читать его целиком незачем
+            raise HTTPException(
+                status_code=400,
+                detail="Не удалось определить разделитель CSV. Используйте ',', ';', табуляцию или '|'"
+            )
+        sep = max(counts, key=counts.get)
+    
+    return sep, encoding
+
+
+def _use_arrow_csv() -> bool:
+    """
+    Можно ли читать CSV через pyarrow
+    
+    Файлы не в UTF-8 pyarrow перекодирует потоково при чтении.
+    
+    Returns:
+        True, если pyarrow установлен и включен в настройках
+    """
+    return settings.USE_FAST_CSV_IO and pa_csv is not None
+
+
 def load_csv_standard(file_path: str) -> pd.DataFrame:
     """
     Стандартная загрузка CSV без разбиения на чанки
     """
     try:
-        # Определение разделителя
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            sample = f.read(4096)
+        # Файл открывается один раз: разделитель и кодировка определяются по образцу,
+        # затем pandas читает тот же дескриптор
+        with open(file_path, 'rb') as f:
+            sep, encoding = _sniff_csv(f)
             
-        if ',' in sample:
-            sep = ','
-        elif ';' in sample:
-            sep = ';'
-        elif '\t' in sample:
-            sep = '\t'
-        else:
-            sep = None  # Автоопределение pandas
-        
-        # Пробуем определить кодировку
-        encodings = ['utf-8', 'latin1', 'cp1251', 'ISO-8859-1']
+            if _use_arrow_csv():
+                try:
+                    df = _read_csv_arrow(f, sep, encoding)
+                    logger.info(f"Файл прочитан через pyarrow с кодировкой {encoding}, строк: {len(df)}")
+                    return df
+                except _ARROW_CSV_FALLBACK_ERRORS as e:
+                    logger.warning(f"pyarrow не смог прочитать файл, читаем средствами pandas: {str(e)}")
+                    f.seek(0)
+            
+            df = pd.read_csv(f, sep=sep, engine='c', encoding=encoding, 
+                             encoding_errors='replace', thousands=' ',
+                             low_memory=True)
         
-        for encoding in encodings:
-            try:
-                # Чтение файла с определенной кодировкой
-                if sep is None:
-                    df = pd.read_csv(file_path, sep=None, engine='python', 
-                                     encoding=encoding, errors='replace', thousands=' ',
-                                     memory_map=True, low_memory=True)
-                else:
-                    df = pd.read_csv(file_path, sep=sep, encoding=encoding, 
-                                    errors='replace', thousands=' ',
-                                    memory_map=True, low_memory=True)
-                
-                # Если дошли до этого места, значит чтение успешно
-                logger.info(f"Файл прочитан с кодировкой {encoding}")
-                break
-            except UnicodeDecodeError:
-                if encoding == encodings[-1]:  # Последняя попытка
-                    logger.error("Не удалось определить кодировку файла")
-                    raise
-                continue
-            except Exception as e:
-                logger.error(f"Ошибка при чтении с кодировкой {encoding}: {str(e)}")
-                raise
+        logger.info(f"Файл прочитан с кодировкой {encoding}")
         
         if df.shape[1] == 1:
             logger.warning("Автоопределение разделителя нашло только 1 столбец. Возможно неправильно определен разделитель.")
@@ -177,99 +282,219 @@ def load_csv_standard(file_path: str) -> pd.DataFrame:
         raise
 
 
+def downcast_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Уменьшение памяти, занимаемой загруженными данными
+    
+    Числовые столбцы приводятся к минимальной подходящей разрядности,
+    строковые столбцы с небольшим числом уникальных значений - к category.
+    
+    Args:
+        df: Загруженный датафрейм (изменяется на месте)
+        
+    Returns:
+        Тот же датафрейм
+    """
+    memory_before = df.memory_usage(deep=True).sum()
+    
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='float')
+        elif (series.dtype == object or isinstance(series.dtype, pd.StringDtype)) and len(series):
+            if series.nunique() / len(series) < CATEGORY_MAX_UNIQUE_RATIO:
+                df[col] = series.astype('category')
+    
+    memory_after = df.memory_usage(deep=True).sum()
+    logger.info(f"Память данных после оптимизации типов: {memory_before / 2**20:.2f} -> {memory_after / 2**20:.2f} МБ")
+    return df
+
+
+def _downcast_chunk(chunk: pd.DataFrame) -> None:
+    """
+    Уменьшение разрядности числовых столбцов на месте для экономии памяти
+    
+    Args:
+        chunk: Датафрейм (чанк или весь файл)
+    """
+    # pd.to_numeric за один проход выбирает наименьший подходящий тип;
+    # значения вне диапазона float32 оставляют столбец в float64.
+    # Данные передаются массивом numpy, чтобы получить обычные типы numpy,
+    # а не nullable Float32/Int8
+    for col in chunk.select_dtypes(include=['float64']).columns:
+        values = chunk[col].to_numpy(dtype='float64', na_value=np.nan)
+        chunk[col] = pd.to_numeric(values, downcast='float')
+    
+    for col in chunk.select_dtypes(include=['int64']).columns:
+        # Столбцы с пропусками не приводятся к целым типам numpy
+        if chunk[col].isna().any():
+            continue
+        chunk[col] = pd.to_numeric(chunk[col].to_numpy(dtype='int64'), downcast='integer')
+
+
+def _parse_space_thousands(df: pd.DataFrame) -> None:
+    """
+    Преобразование строковых столбцов с числами вида "1 000" в числа на месте
+    
+    pyarrow не поддерживает разделитель тысяч, который pandas задает через thousands=' '.
+    
+    Args:
+        df: Датафрейм, прочитанный pyarrow
+    """
+    for col in df.select_dtypes(include=['string', 'object']).columns:
+        values = df[col]
+        # В object-столбцах бывают не только строки (например, datetime.date)
+        if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+            continue
+        if not values.str.contains(' ', regex=False).any():
+            continue
+        parsed = pd.to_numeric(values.str.replace(' ', '', regex=False), errors='coerce')
+        # Столбец числовой, только если при разборе не появилось новых пропусков
+        if parsed.isna().sum() == values.isna().sum():
+            df[col] = parsed
+
+
+def _read_csv_arrow(f: BinaryIO, sep: str, encoding: str = 'utf-8',
+                    block_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Потоковое чтение CSV пакетами Arrow с одним преобразованием в pandas
+    
+    Пакеты объединяются в таблицу без копирования, а self_destruct освобождает
+    буферы Arrow по мере преобразования столбцов: пиковая память близка к размеру
+    итогового датафрейма, а не к удвоенному, как при pd.concat чанков.
+    
+    Args:
+        f: Файл, открытый в двоичном режиме
+        sep: Разделитель
+        encoding: Кодировка файла
+        block_size: Размер блока чтения в байтах (None - CSV_ARROW_BLOCK_SIZE)
+        
+    Returns:
+        Загруженный DataFrame; число пропусков по столбцам - в df.attrs['missing_values']
+    """
+    def open_reader(column_types=None):
+        # Пустые строковые значения считаются пропусками, как в pandas
+        return pa_csv.open_csv(
+            f,
+            read_options=pa_csv.ReadOptions(
+                encoding=encoding,
+                use_threads=True,
+                block_size=block_size or CSV_ARROW_BLOCK_SIZE
+            ),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, column_types=column_types)
+        )
+    
+    reader = open_reader()
+    # Даты и время pyarrow распознает сам (date32 превращается в object-столбец
+    # datetime.date), а pandas оставляет их строками. Чтобы оба пути давали
+    # одинаковые данные, такие столбцы перечитываются как строки; схема известна
+    # после первого блока, поэтому повторно читается только он
+    temporal = {field.name: pa.string() for field in reader.schema if pa.types.is_temporal(field.type)}
+    if temporal:
+        reader.close()
+        f.seek(0)
+        reader = open_reader(temporal)
+    batches = []
+    total_rows = 0
+    # Arrow хранит число пропусков в каждом массиве, подсчет ничего не стоит
+    null_counts = [0] * len(reader.schema)
+    for i, batch in enumerate(reader):
+        batches.append(batch)
+        total_rows += batch.num_rows
+        for j, column in enumerate(batch.columns):
+            null_counts[j] += column.null_count
+        if i % CSV_LOG_INTERVAL == 0:
+            logger.info("Загружено пакетов: %d, всего строк: %d", i + 1, total_rows)
+    
+    if not total_rows:
+        logger.error("CSV файл не содержит данных")
+        raise ValueError("CSV файл не содержит данных")
+    
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    del batches
+    df = table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=_ARROW_NULLABLE_TYPES.get)
+    del table
+    df.attrs['missing_values'] = dict(zip(reader.schema.names, null_counts))
+    
+    _parse_space_thousands(df)
+    _downcast_chunk(df)
+    return df
+
+
 def load_csv_in_chunks(file_path: str, chunk_size: int) -> pd.DataFrame:
     """
     Оптимизированная загрузка большого CSV файла чанками для экономии памяти
+    
+    Число пропусков по столбцам подсчитывается при чтении и сохраняется в df.attrs['missing_values'].
     """
     try:
-        # Определение разделителя на маленьком образце
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            sample = f.read(4096)
+        # Файл открывается один раз: разделитель и кодировка определяются по образцу,
+        # затем pandas читает тот же дескриптор
+        with open(file_path, 'rb') as f:
+            sep, encoding_to_use = _sniff_csv(f)
+            logger.info(f"Используется кодировка {encoding_to_use} для чтения по частям")
             
-        if ',' in sample:
-            sep = ','
-        elif ';' in sample:
-            sep = ';'
-        elif '\t' in sample:
-            sep = '\t'
-        else:
-            sep = None  # Автоопределение pandas
-        
-        # Определение кодировки
-        encodings = ['utf-8', 'latin1', 'cp1251', 'ISO-8859-1']
-        encoding_to_use = 'utf-8'  # По умолчанию
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    f.read(4096)
-                encoding_to_use = encoding
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        logger.info(f"Используется кодировка {encoding_to_use} для чтения по частям")
-        
-        # Чтение по частям с мониторингом памяти
-        chunks = []
-        total_rows = 0
-        chunk_iter = pd.read_csv(
-            file_path, 
-            sep=sep if sep else ',',  # Используем определенный разделитель или запятую по умолчанию
-            engine='python' if sep is None else 'c',
-            chunksize=chunk_size, 
-            encoding=encoding_to_use, 
-            errors='replace',
-            thousands=' ',
-            low_memory=True,
-            memory_map=True,  # Использование mmap для снижения нагрузки на память
-            dtype_backend='numpy_nullable'  # Использование более эффективных типов данных
-        )
-        
-        import gc
-        for i, chunk in enumerate(chunk_iter):
-            # Оптимизация типов данных для экономии памяти
-            for col in chunk.select_dtypes(include=['float64']).columns:
-                # Пробуем конвертировать float64 в float32, если диапазон позволяет
-                if chunk[col].min() >= -3.4e38 and chunk[col].max() <= 3.4e38:
-                    chunk[col] = chunk[col].astype('float32')
-            
-            for col in chunk.select_dtypes(include=['int64']).columns:
-                # Пробуем конвертировать int64 в более компактные типы
-                if chunk[col].min() >= -32768 and chunk[col].max() <= 32767:
-                    chunk[col] = chunk[col].astype('int16')
-                elif chunk[col].min() >= -2147483648 and chunk[col].max() <= 2147483647:
-                    chunk[col] = chunk[col].astype('int32')
+            # С pyarrow файл читается пакетами Arrow без промежуточных чанков pandas
+            if _use_arrow_csv():
+                try:
+                    df = _read_csv_arrow(f, sep, encoding_to_use, block_size=chunk_size * CSV_BYTES_PER_ROW)
+                    logger.info(f"Успешно загружен большой CSV через pyarrow. Всего строк: {len(df)}")
+                    return df
+                except _ARROW_CSV_FALLBACK_ERRORS as e:
+                    logger.warning(f"pyarrow не смог прочитать файл, читаем средствами pandas: {str(e)}")
+                    f.seek(0)
             
-            chunks.append(chunk)
-            total_rows += len(chunk)
-            logger.info(f"Загружен чанк {i+1}, строк: {len(chunk)}, всего строк: {total_rows}")
+            # Чтение по частям с мониторингом памяти
+            chunks = []
+            total_rows = 0
+            # Пропуски считаются по чанкам, пока данные чанка в кеше процессора
+            na_counts = None
+            chunk_iter = pd.read_csv(
+                f, 
+                sep=sep,
+                engine='c',
+                chunksize=chunk_size, 
+                encoding=encoding_to_use, 
+                encoding_errors='replace',
+                thousands=' ',
+                low_memory=True,
+                dtype_backend='numpy_nullable'  # Использование более эффективных типов данных
+            )
             
-            # Принудительно вызываем сборщик мусора после каждого чанка
-            gc.collect()
+            import gc
+            for i, chunk in enumerate(chunk_iter):
+                # Оптимизация типов данных для экономии памяти
+                _downcast_chunk(chunk)
+                
+                chunk_na = chunk.isna().sum()
+                na_counts = chunk_na if na_counts is None else na_counts + chunk_na
+                
+                chunks.append(chunk)
+                total_rows += len(chunk)
+                if i % CSV_LOG_INTERVAL == 0:
+                    logger.info("Загружено чанков: %d, всего строк: %d", i + 1, total_rows)
+                
+                # Принудительно вызываем сборщик мусора после каждого чанка
+                gc.collect()
         
         # Проверяем, есть ли данные
         if not chunks:
             logger.error("CSV файл не содержит данных")
             raise ValueError("CSV файл не содержит данных")
         
-        # Объединяем чанки с оптимизацией памяти
+        # Чанки объединяются одним pd.concat: каждый столбец копируется ровно один раз.
+        # При нехватке памяти попарное объединение не помогает (оно копирует
+        # растущий результат на каждом шаге), поэтому MemoryError уходит наружу
         logger.info(f"Объединение {len(chunks)} чанков")
-        try:
-            # Пробуем использовать pandas concat
-            df = pd.concat(chunks, ignore_index=True, copy=False)
-        except MemoryError:
-            # При нехватке памяти пробуем альтернативный подход
-            logger.warning("Недостаточно памяти для стандартного объединения, пробуем альтернативный метод")
-            # Сохраняем первый чанк как базу
-            df = chunks[0]
-            # Добавляем остальные чанки по очереди
-            for i, chunk in enumerate(chunks[1:], 1):
-                df = pd.concat([df, chunk], ignore_index=True, copy=False)
-                # Удаляем использованный чанк для освобождения памяти
-                chunks[i] = None
-                gc.collect()
+        df = pd.concat(chunks, ignore_index=True, copy=False)
+        del chunks
         
+        df.attrs['missing_values'] = {col: int(count) for col, count in na_counts.items()}
         logger.info(f"Успешно загружен большой CSV по частям. Всего строк: {len(df)}")
         
         return df
@@ -283,6 +508,252 @@ def load_csv_in_chunks(file_path: str, chunk_size: int) -> pd.DataFrame:
         raise
 
 
+def sort_by_item_and_time(df: pd.DataFrame, id_col: str, timestamp_col: str) -> pd.DataFrame:
+    """
+    Сортировка по идентификатору ряда и времени одной сортировкой NumPy
+    
+    Результат совпадает с df.sort_values([id_col, timestamp_col]) (пропуски в конце),
+    но вместо сравнения по двум столбцам сортируются целые коды ID и метки времени.
+    
+    Args:
+        df: Исходный датафрейм
+        id_col: Название колонки с идентификаторами
+        timestamp_col: Название колонки с датами
+        
+    Returns:
+        Отсортированный датафрейм
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df[timestamp_col]):
+        return df.sort_values([id_col, timestamp_col])
+    
+    # Пустой датафрейм уже отсортирован (и у пустого массива кодов нет максимума)
+    if len(df) == 0:
+        return df
+    
+    if isinstance(df[id_col].dtype, pd.CategoricalDtype):
+        # Коды category уже упорядочены по категориям - хешировать значения не нужно
+        codes = df[id_col].cat.codes.to_numpy()
+    else:
+        codes, _ = pd.factorize(df[id_col], sort=True)
+    # Пропуски (код -1 и NaT) переносятся в конец, как при na_position='last'
+    codes = np.where(codes < 0, codes.max() + 1, codes)
+    timestamps = df[timestamp_col].to_numpy(dtype='datetime64[ns]').view('i8')
+    timestamps = np.where(timestamps == np.iinfo(np.int64).min, np.iinfo(np.int64).max, timestamps)
+    
+    # lexsort устойчив и сортирует по последнему ключу в первую очередь
+    order = np.lexsort((timestamps, codes))
+    return df.take(order)
+
+
+def _item_ids_as_strings(values: pd.Series) -> pd.Series:
+    """
+    Приведение идентификаторов рядов к строкам
+    
+    Столбец сначала переводится в category, и в строки преобразуются только
+    уникальные значения, а не каждая строка датафрейма. При небольшом числе рядов
+    результат остается category (целочисленные коды вместо строкового объекта
+    на каждую строку), иначе переводится в обычные строки.
+    
+    Args:
+        values: Столбец с идентификаторами
+        
+    Returns:
+        Столбец со строковыми идентификаторами
+    """
+    if values.hasnans:
+        # Пропуски становятся строкой "nan", как при astype(str)
+        return values.astype(str)
+    
+    item_ids = values.astype('category')
+    labels = item_ids.cat.categories.astype(str)
+    if not labels.is_unique:
+        # Разные значения совпали после приведения к строке (например, 1 и "1")
+        return values.astype(str)
+    # Порядок категорий - как у строк, чтобы сортировка по item_id не менялась
+    item_ids = item_ids.cat.rename_categories(labels).cat.reorder_categories(labels.sort_values())
+    
+    if len(labels) < len(item_ids) * ITEM_ID_CATEGORY_MAX_RATIO:
+        return item_ids
+    return item_ids.astype(str)
+
+
+def _fast_to_datetime(values: pd.Series, errors: str = "coerce") -> pd.Series:
+    """
+    Преобразование строковых дат в datetime с явным форматом
+    
+    Формат определяется один раз по первой строке; повторяющиеся строки
+    разбираются один раз (cache=True). ISO-даты разбираются с format="ISO8601":
+    быстрый разборщик pandas принимает и даты с временем, и без него, поэтому
+    строки с разной точностью не превращаются в NaT. Для остальных форматов
+    результат совпадает с pd.to_datetime, который определяет формат так же.
+    
+    Args:
+        values: Столбец с датами
+        errors: Обработка нераспознанных значений (coerce - NaT, raise - исключение)
+        
+    Returns:
+        Столбец типа datetime
+    """
+    sample = next((value for value in values.head(100) if isinstance(value, str)), None)
+    date_format = pd.tseries.api.guess_datetime_format(sample) if sample else None
+    if date_format and date_format.startswith("%Y-%m-%d"):
+        date_format = "ISO8601"
+    return pd.to_datetime(values, format=date_format, cache=True, errors=errors)
+
+
+def _regular_time_index(start_date: pd.Timestamp, end_date: pd.Timestamp, freq: str) -> pd.DatetimeIndex:
+    """
+    Регулярный временной индекс ряда от начальной до конечной даты
+    
+    Для месяцев, кварталов и лет границы расширяются до начала и конца периода.
+    
+    Args:
+        start_date: Первая дата ряда
+        end_date: Последняя дата ряда
+        freq: Частота данных
+        
+    Returns:
+        Индекс дат с заданной частотой
+    """
+    if freq in ["M", "MS"]:
+        # Для месяцев
+        return pd.date_range(start=start_date.replace(day=1),
+                             end=end_date + pd.offsets.MonthEnd(0),
+                             freq=freq)
+    if freq in ["Q", "QS"]:
+        # Для кварталов
+        return pd.date_range(start=start_date.replace(day=1),
+                             end=end_date + pd.offsets.QuarterEnd(0),
+                             freq=freq)
+    if freq in ["Y", "YS"]:
+        # Для годов
+        return pd.date_range(start=start_date.replace(month=1, day=1),
+                             end=end_date + pd.offsets.YearEnd(0),
+                             freq=freq)
+    # Для дней, рабочих дней, часов, минут, секунд и других частот
+    return pd.date_range(start=start_date, end=end_date, freq=freq)
+
+
+def _series_time_index(df: pd.DataFrame, bounds: pd.DataFrame, freq: str) -> Tuple[np.ndarray, pd.DatetimeIndex]:
+    """
+    Регулярные временные индексы всех рядов, склеенные в один
+    
+    Для частот с фиксированным шагом (D, H, min, S) индексы строятся одной
+    арифметикой NumPy, для календарных частот - через pd.date_range по каждому ряду.
+    
+    Args:
+        df: Данные с мультииндексом (item_id, timestamp)
+        bounds: Первая (min) и последняя (max) дата каждого ряда, индекс - item_id
+        freq: Частота данных
+        
+    Returns:
+        lengths: Длина индекса каждого ряда
+        timestamps: Склеенные индексы всех рядов
+    """
+    try:
+        offset = pd.tseries.frequencies.to_offset(freq)
+    except ValueError:
+        offset = None
+    
+    if isinstance(offset, pd.offsets.Tick) and bounds["min"].dt.tz is None:
+        step = offset.nanos
+        starts = bounds["min"].to_numpy(dtype="datetime64[ns]").view("i8")
+        ends = bounds["max"].to_numpy(dtype="datetime64[ns]").view("i8")
+        lengths = (ends - starts) // step + 1
+        # Номер точки внутри своего ряда для каждой позиции общего индекса
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        timestamps = np.repeat(starts, lengths) + positions * step
+        return lengths, pd.DatetimeIndex(timestamps.view("datetime64[ns]"))
+    
+    ranges = []
+    for item_id, start_date, end_date in zip(bounds.index, bounds["min"], bounds["max"]):
+        try:
+            ranges.append(_regular_time_index(start_date, end_date, freq))
+        except Exception as e:
+            logger.error(f"Ошибка при создании временного индекса для {item_id}: {str(e)}")
+            # Используем исходные даты в качестве резервного варианта
+            ranges.append(df.xs(item_id, level="item_id").index)
+    return np.array([len(r) for r in ranges]), ranges[0].append(ranges[1:])
+
+
+def _ffill_series(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Заполнение вперед, а значений в начале ряда - назад, отдельно внутри каждого ряда
+    
+    Args:
+        df: Датафрейм с мультииндексом (item_id, timestamp), отсортированный по рядам
+        
+    Returns:
+        Датафрейм с заполненными пропусками
+    """
+    df = df.groupby(level="item_id", sort=False, observed=True).ffill()
+    # После ffill пропуски остаются только в начале рядов: обычно их нет, и второй проход не нужен
+    if not df.isna().to_numpy().any():
+        return df
+    return df.groupby(level="item_id", sort=False, observed=True).bfill()
+
+
+def _interpolate_series(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Линейная интерполяция числовых столбцов отдельно внутри каждого ряда
+    
+    Args:
+        df: Датафрейм с мультииндексом (item_id, timestamp), отсортированный по рядам
+        
+    Returns:
+        Датафрейм с заполненными пропусками
+    """
+    numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    if numeric_cols:
+        values = df[numeric_cols]
+        grouped = values.groupby(level="item_id", sort=False, observed=True)
+        forward = grouped.ffill()
+        backward = grouped.bfill()
+        # Интерполяция по всему столбцу верна там, где известны значения до и после
+        # внутри того же ряда; в конце ряда повторяется последнее значение,
+        # начало ряда остается пустым (как у Series.interpolate)
+        inside = forward.notna() & backward.notna()
+        df[numeric_cols] = values.interpolate(method="linear").where(inside, forward)
+    return df
+
+
+# Методы заполнения пропусков после преобразования частоты
+SERIES_FILL_METHODS = {
+    "ffill": _ffill_series,
+    "linear": _interpolate_series,
+    "zero": lambda df: df.fillna(0),
+    "none": lambda df: df,
+}
+
+# Названия методов из интерфейса (см. fill_missing_values) -> ключи SERIES_FILL_METHODS.
+# У Group mean и KNN imputer нет аналога для отдельного ряда: их применяет
+# fill_missing_values, а при преобразовании частоты пропуски остаются
+SERIES_FILL_METHOD_ALIASES = {
+    "forward fill": "ffill",
+    "interpolate": "linear",
+    "constant=0": "zero",
+    "group mean": "none",
+    "knn imputer": "none",
+}
+
+
+def _series_fill_method(fill_method: Optional[str]):
+    """
+    Функция заполнения пропусков по названию метода
+    
+    Args:
+        fill_method: Ключ SERIES_FILL_METHODS или название метода из интерфейса (None - без заполнения)
+        
+    Returns:
+        Функция, заполняющая пропуски в датафрейме с мультииндексом (item_id, timestamp)
+    """
+    name = (fill_method or "none").strip().lower()
+    name = SERIES_FILL_METHOD_ALIASES.get(name, name)
+    if name not in SERIES_FILL_METHODS:
+        raise ValueError(f"Неизвестный метод заполнения пропусков: {fill_method}")
+    return SERIES_FILL_METHODS[name]
+
+
 def convert_to_timeseries(df: pd.DataFrame, id_col: str, timestamp_col: str, target_col: str, 
                          freq: Optional[str] = None, fill_method: str = "ffill") -> pd.DataFrame:
     """
@@ -295,6 +766,7 @@ def convert_to_timeseries(df: pd.DataFrame, id_col: str, timestamp_col: str, tar
         target_col: Название целевой колонки
         freq: Частота данных (D-день, M-месяц, Q-квартал, Y-год, H-час, T-минута, None-автоопределение)
         fill_method: Метод заполнения пропусков после преобразования частоты
+            (ffill, linear, zero, none или название метода из интерфейса)
         
     Returns:
         Датафрейм с переименованными колонками для AutoGluon и правильной частотой
@@ -313,12 +785,14 @@ def convert_to_timeseries(df: pd.DataFrame, id_col: str, timestamp_col: str, tar
     extra_cols = [col for col in df.columns if col not in [id_col, timestamp_col, target_col]]
     cols_to_keep.extend(extra_cols)
     
-    df_local = df[cols_to_keep].copy(deep=False)  # Используем shallow copy
+    # Переупорядочиваем колонки без копирования данных: новые значения
+    # колонок присваиваются ниже, поэтому исходный датафрейм не меняется
+    df_local = pd.concat([df[col] for col in cols_to_keep], axis=1, copy=False)
     
     # Убедимся, что колонка с датами имеет правильный тип
     if not pd.api.types.is_datetime64_any_dtype(df_local[timestamp_col]):
         try:
-            df_local[timestamp_col] = pd.to_datetime(df_local[timestamp_col], errors="coerce")
+            df_local[timestamp_col] = _fast_to_datetime(df_local[timestamp_col])
         except Exception as e:
             logger.error(f"Ошибка преобразования даты: {str(e)}")
             raise ValueError(f"Не удалось преобразовать колонку {timestamp_col} в тип datetime: {str(e)}") 
@@ -337,7 +811,7 @@ def convert_to_timeseries(df: pd.DataFrame, id_col: str, timestamp_col: str, tar
         df_local = df_local.drop_duplicates(subset=[id_col, timestamp_col], keep='first')
     
     # Преобразуем item_id в строку
-    df_local[id_col] = df_local[id_col].astype(str)
+    df_local[id_col] = _item_ids_as_strings(df_local[id_col])
     
     # Переименовываем колонки
     column_mapping = {
@@ -351,127 +825,86 @@ def convert_to_timeseries(df: pd.DataFrame, id_col: str, timestamp_col: str, tar
     mapped_cols = list(column_mapping.keys())
     unchanged_cols = [col for col in all_cols if col not in mapped_cols]
     
-    # Применяем переименование
-    df_local = df_local.rename(columns=column_mapping)
+    # Применяем переименование (без копирования данных)
+    df_local = df_local.rename(columns=column_mapping, copy=False)
     
     # Принудительно вызываем сборщик мусора
     gc.collect()
     
     # Определяем начальные и конечные даты для каждого временного ряда
     if freq and df_local['item_id'].nunique() <= 1000:  # Ограничиваем для предотвращения excessive memory usage
-        # Преобразуем в мультииндекс для упрощения работы с временными рядами
-        df_local = df_local.set_index(["item_id", "timestamp"])
-    
-        # Для каждого ID выполняем преобразование частоты
-        result_pieces = []
-        unique_ids = df_local.index.get_level_values("item_id").unique()
+        # Метод заполнения нужен только здесь и выбирается один раз;
+        # неизвестный метод - ошибка, а не молчаливый пропуск
+        fill_series_gaps = _series_fill_method(fill_method)
+        
+        # Преобразуем в мультииндекс для упрощения работы с временными рядами.
+        # Отсортированный индекс позволяет выбирать ряд срезом, а не полным просмотром
+        df_local = sort_by_item_and_time(df_local, "item_id", "timestamp")
+        
+        # Границы всех рядов - одной группировкой
+        bounds = df_local.groupby("item_id", sort=False, observed=True)["timestamp"].agg(["min", "max"])
+        # df_local уже новый датафрейм после сортировки: индекс ставится на месте, без копии
+        df_local.set_index(["item_id", "timestamp"], inplace=True)
         
         # Предупреждение при большом количестве временных рядов
-        if len(unique_ids) > 100:
+        if len(bounds) > 100:
             logger.warning(
-                f"Большое количество временных рядов ({len(unique_ids)}). " +
+                f"Большое количество временных рядов ({len(bounds)}). " +
                 "Преобразование частоты может занять длительное время."
             )
         
-        for idx, item_id in enumerate(unique_ids):
-            try:
-                # Определяем дату начала и конца для конкретного ряда
-                group = df_local.loc[item_id]
-                start_date = group.index.min()
-                end_date = group.index.max()
-                
-                # Создаем регулярный временной индекс в зависимости от частоты
-                try:
-                    if freq in ["D", "B", "H", "min", "T", "S"]:
-                        # Для дней, рабочих дней, часов, минут, секунд
-                        idx = pd.date_range(start=start_date, end=end_date, freq=freq)
-                    elif freq in ["M", "MS"]:
-                        # Для месяцев
-                        idx = pd.date_range(start=start_date.replace(day=1), 
-                                            end=end_date + pd.offsets.MonthEnd(0), 
-                                            freq=freq)
-                    elif freq in ["Q", "QS"]:
-                        # Для кварталов
-                        idx = pd.date_range(start=start_date.replace(day=1), 
-                                            end=end_date + pd.offsets.QuarterEnd(0), 
-                                            freq=freq)
-                    elif freq in ["Y", "YS"]:
-                        # Для годов
-                        idx = pd.date_range(start=start_date.replace(month=1, day=1), 
-                                            end=end_date + pd.offsets.YearEnd(0), 
-                                            freq=freq)
-                    else:
-                        # Для других частот используем стандартный date_range
-                        idx = pd.date_range(start=start_date, end=end_date, freq=freq)
-                except Exception as e:
-                    logger.error(f"Ошибка при создании временного индекса для {item_id}: {str(e)}")
-                    # Используем исходные даты в качестве резервного варианта
-                    idx = group.index
-                
-                # Создаем полный мультииндекс для данного ID
-                multi_idx = pd.MultiIndex.from_product([[item_id], idx], names=["item_id", "timestamp"])
-                
-                # Переиндексируем данные группы
-                piece = group.reindex(idx)
-                piece.index = multi_idx
-                
-                # Заполняем пропуски в зависимости от метода
-                if fill_method == "ffill":
-                    piece = piece.fillna(method="ffill")
-                    # Дополнительно заполняем значения в начале ряда методом bfill, если они пропущены
-                    piece = piece.fillna(method="bfill")
-                elif fill_method == "linear":
-                    for col in piece.columns:
-                        if pd.api.types.is_numeric_dtype(piece[col]):
-                            piece[col] = piece[col].interpolate(method="linear")
-                elif fill_method == "zero":
-                    piece = piece.fillna(0)
-                
-                result_pieces.append(piece)
-                
-                # Логирование прогресса
-                if (idx + 1) % 100 == 0 or idx == len(unique_ids) - 1:
-                    logger.info(f"Обработано {idx + 1}/{len(unique_ids)} временных рядов")
-                
-                # Периодически вызываем сборщик мусора при большом количестве рядов
-                if (idx + 1) % 500 == 0:
-                    gc.collect()
-                
-            except Exception as e:
-                logger.error(f"Ошибка при обработке временного ряда {item_id}: {str(e)}")
-                logger.error(traceback.format_exc())
-                # Пропускаем проблемный ряд и продолжаем с остальными
-                continue
-        
-        # Собираем все кусочки вместе
-        if result_pieces:
-            try:
-                df_local = pd.concat(result_pieces)
-                # Принудительная сборка мусора после объединения
-                gc.collect()
-                # Сбрасываем индекс
-                df_local = df_local.reset_index()
-            except MemoryError:
-                logger.error("Недостаточно памяти при объединении временных рядов")
-                # Альтернативный подход при нехватке памяти
-                df_base = result_pieces[0]
-                for piece in result_pieces[1:]:
-                    df_base = pd.concat([df_base, piece])
-                    gc.collect()
-                df_local = df_base.reset_index()
-        else:
-            logger.warning("Не удалось обработать ни один временной ряд. Возвращаем исходные данные.")
+        try:
+            # Регулярные индексы всех рядов склеиваются в один мультииндекс,
+            # и данные переиндексируются за один вызов вместо цикла по рядам
+            lengths, timestamps = _series_time_index(df_local, bounds, freq)
+            full_idx = pd.MultiIndex.from_arrays(
+                [bounds.index.repeat(lengths), timestamps],
+                names=["item_id", "timestamp"]
+            )
+            df_local = fill_series_gaps(df_local.reindex(full_idx))
+            df_local = df_local.reset_index()
+            logger.info(f"Обработано {len(bounds)} временных рядов")
+        except Exception as e:
+            logger.error(f"Ошибка при преобразовании частоты временных рядов: {str(e)}")
+            logger.error(traceback.format_exc())
+            logger.warning("Не удалось обработать временные ряды. Возвращаем исходные данные.")
             # Восстанавливаем исходные данные
-            df_local = df[cols_to_keep].copy()
-            df_local = df_local.rename(columns=column_mapping)
+            df_local = pd.concat([df[col] for col in cols_to_keep], axis=1, copy=False)
+            df_local = df_local.rename(columns=column_mapping, copy=False)
             # Убедимся, что колонка с датами имеет правильный тип
             if not pd.api.types.is_datetime64_any_dtype(df_local["timestamp"]):
-                df_local["timestamp"] = pd.to_datetime(df_local["timestamp"], errors="coerce")
+                df_local["timestamp"] = _fast_to_datetime(df_local["timestamp"])
     
     logger.info(f"Преобразование в формат временных рядов завершено. Строк: {len(df_local)}")
     return df_local
 
 
+def _freq_from_seconds(seconds: float) -> Optional[str]:
+    """
+    Частота по типичному интервалу между метками времени
+    
+    Args:
+        seconds: Интервал в секундах
+        
+    Returns:
+        Строка с частотой или None, если интервал не распознан
+    """
+    days = seconds / 86400
+    if seconds == 60:  # 1 минута
+        return "T"
+    if seconds == 3600:  # 1 час
+        return "H"
+    if seconds == 86400:  # 1 день
+        return "D"
+    if 25 <= days <= 35:  # ~1 месяц (в днях)
+        return "M"
+    if 85 <= days <= 95:  # ~3 месяца (в днях)
+        return "Q"
+    if 350 <= days <= 380:  # ~1 год (в днях)
+        return "Y"
+    return None
+
+
 def detect_frequency(df: pd.DataFrame, timestamp_col: str, id_col: Optional[str] = None) -> str:
     """
     Определяет частоту временного ряда на основе данных
@@ -491,51 +924,43 @@ def detect_frequency(df: pd.DataFrame, timestamp_col: str, id_col: Optional[str]
     # Убедимся, что колонка с датами имеет правильный тип
     timestamps = df[timestamp_col]
     if not pd.api.types.is_datetime64_any_dtype(timestamps):
-        timestamps = pd.to_datetime(timestamps, errors="coerce")
+        timestamps = _fast_to_datetime(timestamps)
     
-    # Определяем частоту для каждого ID отдельно, если указан id_col
+    # Определяем частоту по интервалам внутри рядов, если указан id_col
     if id_col and id_col in df.columns:
-        freq_counts = {}
-        for name, group in df.groupby(id_col):
-            group_timestamps = group[timestamp_col]
-            if not pd.api.types.is_datetime64_any_dtype(group_timestamps):
-                group_timestamps = pd.to_datetime(group_timestamps, errors="coerce")
+        valid = (timestamps.notna() & df[id_col].notna()).to_numpy()
+        frame = pd.DataFrame({"item_id": df[id_col], "timestamp": timestamps})[valid]
+        # Одна сортировка: ряды идут подряд, интервалы считаются одним np.diff,
+        # а разности на границах соседних рядов отбрасываются
+        frame = sort_by_item_and_time(frame, "item_id", "timestamp")
+        codes, _ = pd.factorize(frame["item_id"])
+        ts = frame["timestamp"].to_numpy(dtype="datetime64[ns]").view("i8")
+        same_item = codes[1:] == codes[:-1]
+        diffs = np.diff(ts)[same_item]
+        
+        if len(diffs) > 0:
+            # Модальный интервал каждого ряда: value_counts по парам (ряд, интервал)
+            # упорядочен по убыванию, первая пара ряда - его самый частый интервал
+            pairs = pd.DataFrame({"code": codes[1:][same_item], "diff": diffs})
+            modes = pairs.value_counts(sort=True).reset_index().drop_duplicates("code")
             
-            if len(group_timestamps) > 1:
-                # Сортируем и находим разницы между последовательными метками времени
-                sorted_ts = group_timestamps.sort_values()
-                diffs = sorted_ts.diff().dropna()
-                
-                if len(diffs) > 0:
-                    # Находим наиболее частый интервал
-                    most_common_diff = diffs.value_counts().index[0]
-                    freq = pd.infer_freq(sorted_ts)
-                    if freq:
-                        freq_counts[freq] = freq_counts.get(freq, 0) + 1
-                    else:
-                        # Если автоматическое определение не сработало, пробуем определить вручную
-                        seconds = most_common_diff.total_seconds()
-                        
-                        if seconds == 60:  # 1 минута
-                            inferred_freq = "T"
-                        elif seconds == 3600:  # 1 час
-                            inferred_freq = "H"
-                        elif seconds == 86400:  # 1 день
-                            inferred_freq = "D"
-                        elif 25 <= seconds / 86400 <= 35:  # ~1 месяц (в днях)
-                            inferred_freq = "M"
-                        elif 85 <= seconds / 86400 <= 95:  # ~3 месяца (в днях)
-                            inferred_freq = "Q"
-                        elif 350 <= seconds / 86400 <= 380:  # ~1 год (в днях)
-                            inferred_freq = "Y"
-                        else:
-                            inferred_freq = "D"  # По умолчанию - день
-                        
-                        freq_counts[inferred_freq] = freq_counts.get(inferred_freq, 0) + 1
-        
-        # Возвращаем наиболее часто встречающуюся частоту
-        if freq_counts:
-            return max(freq_counts.items(), key=lambda x: x[1])[0]
+            # Голосование рядов: интервалы одной частоты (например, 28-31 день) считаются вместе
+            seconds = modes["diff"].to_numpy() / 1e9
+            votes = pd.Series([_freq_from_seconds(sec) or sec for sec in seconds], index=modes["code"].to_numpy())
+            winner = votes.value_counts(sort=True).index[0]
+            
+            # pd.infer_freq вызывается один раз - для самого длинного ряда победившей частоты
+            counts = np.bincount(codes)
+            voters = votes.index[(votes == winner).to_numpy()]
+            longest = voters[counts[voters].argmax()]
+            if counts[longest] >= 3:
+                start = np.searchsorted(codes, longest)
+                freq = pd.infer_freq(frame["timestamp"].iloc[start:start + counts[longest]])
+                if freq:
+                    return freq
+            
+            # Если автоматическое определение не сработало, берем частоту по интервалу
+            return winner if isinstance(winner, str) else "D"  # По умолчанию - день
     
     # Если id_col не указан или не удалось определить частоту по группам
     # Пробуем определить общую частоту для всего набора данных
@@ -550,20 +975,9 @@ def detect_frequency(df: pd.DataFrame, timestamp_col: str, id_col: Optional[str]
         diffs = sorted_ts.diff().dropna()
         if len(diffs) > 0:
             most_common_diff = diffs.value_counts().index[0]
-            seconds = most_common_diff.total_seconds()
-            
-            if seconds == 60:  # 1 минута
-                return "T"
-            elif seconds == 3600:  # 1 час
-                return "H"
-            elif seconds == 86400:  # 1 день
-                return "D"
-            elif 25 <= seconds / 86400 <= 35:  # ~1 месяц (в днях)
-                return "M"
-            elif 85 <= seconds / 86400 <= 95:  # ~3 месяца (в днях)
-                return "Q"
-            elif 350 <= seconds / 86400 <= 380:  # ~1 год (в днях)
-                return "Y"
+            freq = _freq_from_seconds(most_common_diff.total_seconds())
+            if freq:
+                return freq
     
     # Если не удалось определить частоту, возвращаем "D" (день) по умолчанию
     return "D"
@@ -580,27 +994,34 @@ def split_train_test(df: pd.DataFrame, date_col: str, test_size: float = 0.2, va
         validation_size: Доля данных для валидационной выборки
         
     Returns:
-        Кортеж из train, test и опционально validation датафреймов
+        Кортеж из train, test и опционально validation датафреймов,
+        каждая выборка отсортирована по дате
     """
     # Убеждаемся, что колонка даты в формате datetime
     if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
-        df = df.copy()
-        df[date_col] = pd.to_datetime(df[date_col])
-    
-    # Сортируем по дате
-    df_sorted = df.sort_values(date_col)
+        # Shallow copy: заменяется только колонка даты, остальные данные не копируются
+        df = df.copy(deep=False)
+        df[date_col] = _fast_to_datetime(df[date_col], errors="raise")
     
     # Вычисляем индексы разделения
-    n = len(df_sorted)
+    n = len(df)
     test_idx = int(n * (1 - test_size))
+    val_idx = int(n * (1 - test_size - validation_size)) if validation_size > 0 else test_idx
     
+    # Полная сортировка не нужна: argpartition за O(N) разносит строки по границам
+    # разделения, так что выборки не пересекаются по времени, после чего
+    # каждая выборка сортируется по дате отдельно
+    ts = df[date_col].to_numpy(dtype='datetime64[ns]')
+    kth = sorted({k for k in (val_idx, test_idx) if 0 <= k < n})
+    order = np.argpartition(ts, kth) if kth else np.arange(n)
+    
+    def sorted_by_date(positions: np.ndarray) -> pd.DataFrame:
+        positions = np.sort(positions)
+        return df.iloc[positions[np.argsort(ts[positions], kind='stable')]]
+    
+    train = sorted_by_date(order[:val_idx])
+    test = sorted_by_date(order[test_idx:])
     if validation_size > 0:
-        val_idx = int(n * (1 - test_size - validation_size))
-        train = df_sorted.iloc[:val_idx]
-        val = df_sorted.iloc[val_idx:test_idx]
-        test = df_sorted.iloc[test_idx:]
+        val = sorted_by_date(order[val_idx:test_idx])
         return train, test, val
-    else:
-        train = df_sorted.iloc[:test_idx]
-        test = df_sorted.iloc[test_idx:]
-        return train, test, None
\ No newline at end of file
+    return train, test, None
\ No newline at end of file
@@ -1,10 +1,9 @@
 """
 Service for managing dataset operations using in-memory storage
 """
-import json
 import pandas as pd
 from typing import Dict, Any, List, Optional
-from app.models.dataset import Dataset, DatasetPreprocessing, datasets, preprocessings
+from app.models.dataset import Dataset, DatasetPreprocessing, datasets, preprocessings, preprocessings_by_dataset
 from app.services.data.data_processing import process_uploaded_file, detect_frequency
 import uuid
 import logging
@@ -34,16 +33,19 @@ class DataService:
             categorical_cols = [col for col in df.columns if pd.api.types.is_categorical_dtype(df[col])
                               or pd.api.types.is_object_dtype(df[col])]
             
-            # Calculate basic statistics
+            # Calculate basic statistics: one missing-value pass and one aggregation for all columns
+            na_counts = df.isna().sum()
             stats = {}
-            for col in numeric_cols:
-                stats[col] = {
-                    "min": float(df[col].min()),
-                    "max": float(df[col].max()),
-                    "mean": float(df[col].mean()),
-                    "std": float(df[col].std()),
-                    "missing": int(df[col].isna().sum())
-                }
+            if numeric_cols:
+                summary = df[numeric_cols].agg(["min", "max", "mean", "std"])
+                for col in numeric_cols:
+                    stats[col] = {
+                        "min": float(summary.at["min", col]),
+                        "max": float(summary.at["max", col]),
+                        "mean": float(summary.at["mean", col]),
+                        "std": float(summary.at["std", col]),
+                        "missing": int(na_counts[col])
+                    }
             
             # Create dataset record
             dataset = Dataset(
@@ -53,12 +55,12 @@ class DataService:
                 rows_count=len(df),
                 columns_count=len(df.columns),
                 frequency=detect_frequency(df, date_cols[0]) if date_cols else None,
-                has_missing_values=int(df.isna().any().any()),
+                has_missing_values=int(na_counts.any()),
                 date_column=date_cols[0] if date_cols else None,
                 target_column=None,  # Will be set later by user
-                feature_columns=json.dumps(df.columns.tolist()),
-                categorical_columns=json.dumps(categorical_cols),
-                numeric_columns=json.dumps(numeric_cols),
+                feature_columns=df.columns.tolist(),
+                categorical_columns=categorical_cols,
+                numeric_columns=numeric_cols,
                 statistics=stats,
                 additional_info={},
             )
@@ -138,6 +140,7 @@ class DataService:
             )
             
             preprocessings[preprocessing_id] = preprocessing
+            preprocessings_by_dataset.setdefault(dataset_id, []).append(preprocessing_id)
             
             return preprocessing
         except Exception as e:
@@ -154,4 +157,4 @@ class DataService:
         """
         Get all preprocessings for a dataset
         """
-        return [p for p in preprocessings.values() if p.dataset_id == dataset_id]
\ No newline at end of file
+        return [preprocessings[p_id] for p_id in preprocessings_by_dataset.get(dataset_id, [])]
\ No newline at end of file
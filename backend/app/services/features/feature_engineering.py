@@ -3,6 +3,7 @@ import numpy as np
 import logging
 import holidays
 from typing import List, Optional, Dict, Any
+from app.services.data.data_processing import sort_by_item_and_time
 
 logger = logging.getLogger(__name__)
 
@@ -77,7 +78,7 @@ def add_russian_holiday_feature(df: pd.DataFrame, date_col="timestamp", holiday_
     
     # Сортируем датафрейм по дате для правильного определения длинных выходных
     if id_col := next((col for col in df.columns if "id" in col.lower()), None):
-        temp_df = result_df.sort_values([id_col, date_col])
+        temp_df = sort_by_item_and_time(result_df, id_col, date_col)
     else:
         temp_df = result_df.sort_values(date_col)
     
@@ -288,7 +289,7 @@ def generate_lag_features(df: pd.DataFrame, target_col: str, date_col: str,
     
     # Сортируем по дате
     if id_col and id_col in df.columns:
-        df_result = df_result.sort_values([id_col, date_col])
+        df_result = sort_by_item_and_time(df_result, id_col, date_col)
     else:
         df_result = df_result.sort_values(date_col)
     
@@ -333,7 +334,7 @@ def generate_rolling_features(df: pd.DataFrame, target_col: str, date_col: str,
     
     # Сортируем по дате
     if id_col and id_col in df.columns:
-        df_result = df_result.sort_values([id_col, date_col])
+        df_result = sort_by_item_and_time(df_result, id_col, date_col)
     else:
         df_result = df_result.sort_values(date_col)
     
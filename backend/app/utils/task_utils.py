@@ -22,9 +22,8 @@ def get_task_by_id(queue, task_id: str) -> Dict[str, Any]:
     Raises:
         HTTPException: When task is not found or in incorrect status
     """
-    # Get all tasks from queue
-    tasks = queue.get_all_tasks()
-    task = next((t for t in tasks if t.get("task_id") == task_id), None)
+    # Direct lookup by key instead of scanning all tasks
+    task = queue.get_task(task_id)
     
     if not task:
         logger.error(f"Task with ID {task_id} not found")
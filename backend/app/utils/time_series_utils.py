@@ -117,9 +117,9 @@ class TimeSeriesPreprocessor:
         elif method == 'cubic':
             filled_df[self.value_column] = filled_df[self.value_column].interpolate(method='cubic')
         elif method == 'ffill':
-            filled_df[self.value_column] = filled_df[self.value_column].fillna(method='ffill')
+            filled_df[self.value_column] = filled_df[self.value_column].ffill()
         elif method == 'bfill':
-            filled_df[self.value_column] = filled_df[self.value_column].fillna(method='bfill')
+            filled_df[self.value_column] = filled_df[self.value_column].bfill()
         elif method == 'mean':
             filled_df[self.value_column] = filled_df[self.value_column].fillna(
                 filled_df[self.value_column].mean()
@@ -0,0 +1,216 @@
+"""
+Tests for data loading and time series conversion helpers
+"""
+import pytest
+import pandas as pd
+from app.services.data import data_processing
+from app.services.data.data_processing import sort_by_item_and_time, convert_to_timeseries, detect_frequency, split_train_test
+
+
+def empty_frame():
+    return pd.DataFrame({
+        'id': pd.Series([], dtype=object),
+        'date': pd.Series([], dtype='datetime64[ns]'),
+        'value': pd.Series([], dtype=float)
+    })
+
+
+def test_sort_by_item_and_time_empty():
+    # Пустой датафрейм возвращается без ошибки
+    result = sort_by_item_and_time(empty_frame(), 'id', 'date')
+
+    assert result.empty
+    assert list(result.columns) == ['id', 'date', 'value']
+
+
+def test_convert_to_timeseries_empty():
+    result = convert_to_timeseries(empty_frame(), 'id', 'date', 'value', freq='D')
+
+    assert result.empty
+    assert list(result.columns) == ['item_id', 'timestamp', 'target']
+
+
+def gapped_frame():
+    return pd.DataFrame({
+        'id': ['a', 'a', 'a'],
+        'date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-04']),
+        'value': [1.0, 2.0, 4.0]
+    })
+
+
+@pytest.mark.parametrize("fill_method, expected", [
+    ("ffill", 2.0),
+    ("Forward fill", 2.0),
+    ("Interpolate", 3.0),
+    ("Constant=0", 0.0),
+])
+def test_convert_to_timeseries_fill_methods(fill_method, expected):
+    # Названия методов из интерфейса принимаются наравне с ключами
+    result = convert_to_timeseries(gapped_frame(), 'id', 'date', 'value', freq='D', fill_method=fill_method)
+
+    assert len(result) == 4
+    assert result['target'].iloc[2] == expected
+
+
+def test_convert_to_timeseries_unknown_fill_method():
+    # Без преобразования частоты метод заполнения не используется
+    result = convert_to_timeseries(gapped_frame(), 'id', 'date', 'value', fill_method='unknown')
+    assert len(result) == 3
+
+    with pytest.raises(ValueError):
+        convert_to_timeseries(gapped_frame(), 'id', 'date', 'value', freq='D', fill_method='unknown')
+
+
+ISO_DATES_CSV = "date,value,name\n2024-01-01,1,a b\n2024-01-02,2,c\n2024-01-03,1 000,d\n"
+
+
+def test_read_csv_arrow_iso_dates(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "iso.csv"
+    path.write_text(ISO_DATES_CSV)
+
+    # Даты, которые pyarrow распознает как date32, остаются строками, как у pandas
+    with open(path, 'rb') as f:
+        df = data_processing._read_csv_arrow(f, ',')
+
+    assert df['date'].tolist() == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert df['value'].tolist() == [1, 2, 1000]
+    assert df['name'].tolist() == ['a b', 'c', 'd']
+
+
+@pytest.mark.parametrize("loader", [
+    data_processing.load_csv_standard,
+    lambda path: data_processing.load_csv_in_chunks(path, 2),
+])
+def test_load_csv_arrow_matches_pandas(tmp_path, monkeypatch, loader):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.csv"
+    path.write_text(
+        "date;item;value;comment\n"
+        "2024-01-01;a;1,5;x y\n"
+        "2024-01-02;a;;\n"
+        "2024-01-01;b;3,25;z\n"
+    )
+
+    monkeypatch.setattr(data_processing.settings, "USE_FAST_CSV_IO", True)
+    arrow_df = loader(str(path))
+    monkeypatch.setattr(data_processing.settings, "USE_FAST_CSV_IO", False)
+    pandas_df = loader(str(path))
+
+    # Типы могут отличаться (nullable, разрядность), значения - нет
+    pd.testing.assert_frame_equal(
+        arrow_df.astype(object).where(arrow_df.notna(), None),
+        pandas_df.astype(object).where(pandas_df.notna(), None),
+        check_dtype=False
+    )
+
+
+def test_load_csv_falls_back_to_pandas(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.csv"
+    path.write_text(ISO_DATES_CSV)
+
+    # Ошибка при обработке прочитанных pyarrow данных не приводит к отказу загрузки
+    def broken(df):
+        raise AttributeError("broken")
+    monkeypatch.setattr(data_processing.settings, "USE_FAST_CSV_IO", True)
+    monkeypatch.setattr(data_processing, "_parse_space_thousands", broken)
+
+    df = data_processing.load_csv_standard(str(path))
+
+    assert df['value'].tolist() == [1, 2, 1000]
+
+
+def test_detect_frequency_majority_vote():
+    # Один длинный недельный ряд и три коротких дневных: побеждает большинство рядов
+    weekly = pd.DataFrame({'id': 'w', 'date': pd.date_range('2024-01-07', periods=30, freq='W')})
+    daily = [pd.DataFrame({'id': item, 'date': pd.date_range('2024-01-01', periods=5, freq='D')})
+             for item in ['a', 'b', 'c']]
+    df = pd.concat([weekly] + daily).sample(frac=1, random_state=0)
+
+    assert detect_frequency(df, 'date', 'id') == 'D'
+    assert detect_frequency(weekly, 'date', 'id') == 'W-SUN'
+
+
+def test_fast_to_datetime_mixed_iso_precision():
+    values = pd.Series(['2024-01-05', '2024-01-06 10:00', None, 'bad', '2024-02-01T03:00:00'])
+
+    # ISO-даты с временем и без него разбираются, нераспознанные значения дают NaT
+    result = data_processing._fast_to_datetime(values)
+
+    assert result.tolist()[:3] == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-06 10:00'), pd.NaT]
+    assert pd.isna(result.iloc[3])
+    assert result.iloc[4] == pd.Timestamp('2024-02-01 03:00')
+    with pytest.raises(ValueError):
+        data_processing._fast_to_datetime(values, errors='raise')
+
+
+def test_fast_to_datetime_matches_pandas():
+    # Для не-ISO форматов результат совпадает с pd.to_datetime
+    values = pd.Series(pd.date_range('2024-01-01', periods=48, freq='h').strftime('%d/%m/%Y %H:%M'))
+    pd.testing.assert_series_equal(data_processing._fast_to_datetime(values), pd.to_datetime(values, errors='coerce'))
+
+
+def test_split_train_test_order_and_boundaries():
+    dates = pd.date_range('2024-01-01', periods=20, freq='D')
+    df = pd.DataFrame({'date': dates, 'value': range(20)}).sample(frac=1, random_state=0)
+
+    train, test, val = split_train_test(df, 'date', test_size=0.2, validation_size=0.1)
+
+    # Каждая выборка отсортирована по дате, границы разделения - как у полной сортировки
+    assert train['date'].tolist() == list(dates[:14])
+    assert val['date'].tolist() == list(dates[14:16])
+    assert test['date'].tolist() == list(dates[16:])
+
+
+def multi_item_frame():
+    # Ряд a - пропуск 3 января, ряд b - два пропуска подряд, ряд c - одна точка
+    return pd.DataFrame({
+        'id': ['b', 'a', 'a', 'c', 'b', 'a', 'a'],
+        'date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-03',
+                                '2024-01-04', '2024-01-04', '2024-01-05']),
+        'value': [10.0, 1.0, 2.0, 7.0, 40.0, 4.0, 5.0]
+    })
+
+
+@pytest.mark.parametrize("fill_method, expected_a, expected_b", [
+    ("ffill", [1.0, 2.0, 2.0, 4.0, 5.0], [10.0, 10.0, 10.0, 40.0]),
+    ("linear", [1.0, 2.0, 3.0, 4.0, 5.0], [10.0, 20.0, 30.0, 40.0]),
+    ("zero", [1.0, 2.0, 0.0, 4.0, 5.0], [10.0, 0.0, 0.0, 40.0]),
+    ("none", [1.0, 2.0, None, 4.0, 5.0], [10.0, None, None, 40.0]),
+])
+def test_convert_to_timeseries_multi_item_gaps(fill_method, expected_a, expected_b):
+    result = convert_to_timeseries(multi_item_frame(), 'id', 'date', 'value', freq='D', fill_method=fill_method)
+
+    # Ряды заполняются независимо, каждый - в пределах своих дат
+    series = {item: group for item, group in result.groupby('item_id')}
+    assert list(series) == ['a', 'b', 'c']
+    assert series['a']['timestamp'].tolist() == list(pd.date_range('2024-01-01', '2024-01-05'))
+    assert series['b']['timestamp'].tolist() == list(pd.date_range('2024-01-01', '2024-01-04'))
+    assert series['c']['target'].tolist() == [7.0]
+    pd.testing.assert_series_equal(series['a']['target'].reset_index(drop=True),
+                                   pd.Series(expected_a, dtype=float, name='target'))
+    pd.testing.assert_series_equal(series['b']['target'].reset_index(drop=True),
+                                   pd.Series(expected_b, dtype=float, name='target'))
+
+
+@pytest.mark.parametrize("freq, dates_a, dates_b", [
+    ("MS", ['2024-01-01', '2024-02-01', '2024-04-01'], ['2024-01-01', '2024-03-01']),
+    ("W", ['2024-01-07', '2024-01-14', '2024-01-28'], ['2024-01-07', '2024-01-21']),
+])
+def test_convert_to_timeseries_calendar_freq(freq, dates_a, dates_b):
+    df = pd.DataFrame({
+        'id': ['a'] * 3 + ['b'] * 2,
+        'date': pd.to_datetime(dates_a + dates_b),
+        'value': [1.0, 2.0, 4.0, 10.0, 30.0]
+    })
+
+    # Календарные частоты строят индекс через pd.date_range по каждому ряду
+    result = convert_to_timeseries(df, 'id', 'date', 'value', freq=freq, fill_method='linear')
+
+    a = result[result['item_id'] == 'a']
+    b = result[result['item_id'] == 'b']
+    assert a['timestamp'].tolist() == list(pd.date_range(dates_a[0], dates_a[-1], freq=freq))
+    assert b['timestamp'].tolist() == list(pd.date_range(dates_b[0], dates_b[-1], freq=freq))
+    assert a['target'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert b['target'].tolist() == [10.0, 20.0, 30.0]
@@ -0,0 +1,193 @@
+"""
+Tests for the Redis-backed job queue (run against fakeredis)
+"""
+import json
+import pytest
+from app.core import queue as queue_module
+
+fakeredis = pytest.importorskip("fakeredis")
+
+SCRIPTS = {
+    "_update_progress_script": queue_module.UPDATE_PROGRESS_SCRIPT,
+    "_start_task_script": queue_module.START_TASK_SCRIPT,
+    "_requeue_task_script": queue_module.REQUEUE_TASK_SCRIPT,
+    "_reap_claims_script": queue_module.REAP_CLAIMS_SCRIPT,
+    "_push_task_script": queue_module.PUSH_TASK_SCRIPT,
+    "_read_task_script": queue_module.READ_TASK_SCRIPT,
+    "_cleanup_tasks_script": queue_module.CLEANUP_TASKS_SCRIPT,
+}
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    # Общий клиент и скрипты модуля подменяются клиентом fakeredis
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(queue_module, "_redis_client", client)
+    for name, script in SCRIPTS.items():
+        monkeypatch.setattr(queue_module, name, client.register_script(script))
+    queue_module._task_cache.clear()
+    job_queue = queue_module.JobQueue()
+    yield job_queue
+    # Буфер логов общий для процесса: записываем его, пока подменен клиент
+    job_queue.flush_logs()
+    queue_module._task_cache.clear()
+
+
+@pytest.fixture
+def legacy_tasks(queue):
+    # Ключи старого формата: задача - JSON-строка, изменения - в хеше tasks, лог - список
+    redis = queue.redis
+    redis.set("task:old1", json.dumps({"task_id": "old1", "status": "pending", "created_at": 5.0, "updated_at": 5.0}))
+    redis.hset("tasks", "old1", json.dumps({"task_id": "old1", "status": "completed", "created_at": 5.0, "updated_at": 6.0}))
+    redis.set("task:old2", json.dumps({"task_id": "old2", "status": "failed", "created_at": 4.0, "updated_at": 4.5}))
+    redis.lpush("task_log:old1", json.dumps({"timestamp": 1, "level": "INFO", "message": "first", "details": None}))
+    redis.lpush("task_log:old1", json.dumps({"timestamp": 2, "level": "INFO", "message": "second", "details": None}))
+    return ["old1", "old2"]
+
+
+def test_legacy_keys_stats_and_listing(queue, legacy_tasks):
+    # Новая задача создает счетчики и индекс, но старые задачи все равно учитываются
+    new_id = queue.add_task("user", "training", {})
+
+    stats = queue.get_queue_stats()
+    assert stats["total_tasks"] == 3
+    assert stats["pending_tasks"] == 1
+    assert stats["completed_tasks"] == 1
+    assert stats["failed_tasks"] == 1
+
+    tasks, _ = queue.list_tasks_page()
+    assert [task["task_id"] for task in tasks] == [new_id, "old1", "old2"]
+
+
+def test_legacy_task_and_logs_are_readable(queue, legacy_tasks):
+    assert queue.get_task("old1")["status"] == "completed"
+    assert [log["message"] for log in queue.get_task_logs("old1")] == ["second", "first"]
+    assert queue.redis.type("task:old2") == b"hash"
+
+
+def test_task_lifecycle_complete(queue):
+    first = queue.add_task("user", "training", {})
+    second = queue.add_task("user", "prediction", {})
+    assert queue.get_positions_bulk([first, second]) == [1, 2]
+
+    # Извлеченная задача остается в очереди на своем месте до запуска
+    assert queue.claim_next_task(timeout=0) == first
+    assert queue.get_task(first)["status"] == "pending"
+    assert queue.get_position(first) == 1
+    assert queue.active_task_count() == 1
+
+    task = queue.start_task(first)
+    assert task["status"] == "executing"
+    assert queue.get_position(second) == 1
+    assert queue.active_task_count() == 1
+
+    queue.mark_started(first)
+    queue.complete_task(first, {"summary": "ok"})
+
+    task = queue.get_task(first)
+    assert task["status"] == "completed"
+    assert task["result"] == {"summary": "ok"}
+    assert queue.active_task_count() == 0
+    assert queue.get_task_logs(first)[0]["message"] == "Задача успешно завершена"
+
+    stats = queue.get_queue_stats()
+    assert (stats["pending_tasks"], stats["executing_tasks"], stats["completed_tasks"]) == (1, 0, 1)
+    assert stats["average_waiting_time"] is not None
+    assert stats["average_execution_time"] is not None
+
+
+def test_task_lifecycle_fail_and_retry(queue):
+    task_id = queue.add_task("user", "training", {})
+    queue.claim_next_task(timeout=0)
+    queue.start_task(task_id)
+
+    queue.fail_task(task_id, "boom")
+    task = queue.get_task(task_id)
+    assert (task["status"], task["error"]) == ("failed", "boom")
+    assert queue.claim_next_task(timeout=0) is None
+
+    # Повторная попытка ставит задачу в конец очереди
+    assert queue.retry_task(task_id)
+    task = queue.get_task(task_id)
+    assert (task["status"], task["retry_count"], task["error"]) == ("pending", 1, None)
+    assert queue.claim_next_task(timeout=0) == task_id
+    assert queue.start_task(task_id)["status"] == "executing"
+
+    stats = queue.get_queue_stats()
+    assert (stats["pending_tasks"], stats["executing_tasks"], stats["failed_tasks"]) == (0, 1, 0)
+
+
+def test_requeue_expired_claims(queue):
+    expired = queue.add_task("user", "training", {})
+    fresh = queue.add_task("user", "training", {})
+    orphan = queue.add_task("user", "training", {})
+    assert queue.claim_next_task(timeout=0) == expired
+    assert queue.claim_next_task(timeout=0) == fresh
+    # Процесс упал сразу после переноса задачи: срока запуска у нее нет
+    queue.redis.lmove("task_queue", queue_module.PROCESSING_KEY, "LEFT", "RIGHT")
+    queue.redis.zadd(queue_module.CLAIMS_KEY, {expired: 0})
+
+    # Возвращается только просроченная задача; задаче без срока он назначается
+    assert queue.requeue_expired_claims() == [expired]
+    assert queue.redis.lrange("task_queue", 0, -1) == [expired.encode()]
+    assert queue.redis.zscore(queue_module.CLAIMS_KEY, orphan) is not None
+    assert queue.active_task_count() == 2
+
+    # Запоздавший запуск возвращенной задачи не выполняется: ее выполнит следующая выдача
+    assert queue.start_task(expired) is None
+    assert queue.get_task(expired)["status"] == "pending"
+    assert queue.claim_next_task(timeout=0) == expired
+    assert queue.start_task(expired)["status"] == "executing"
+
+    # Незапущенную задачу можно вернуть в очередь, запущенную - нет
+    assert queue.release_task(fresh)
+    assert not queue.release_task(expired)
+    assert queue.redis.lrange("task_queue", 0, -1) == [fresh.encode()]
+
+
+def assert_stats_consistent(queue):
+    # Счетчики, которые обновлялись при каждой смене статуса, совпадают с пересчетом по задачам
+    live = queue.get_queue_stats()
+    queue.rebuild_stats()
+    rebuilt = queue.get_queue_stats()
+    assert live == pytest.approx(rebuilt)
+
+    tasks = list(queue.iter_tasks())
+    pending = {task["task_id"] for task in tasks if task["status"] == "pending"}
+    queued = {task_id.decode() for task_id in queue.redis.lrange("task_queue", 0, -1)}
+    indexed = {task_id.decode() for task_id in queue.redis.zrange(queue_module.QUEUE_INDEX_KEY, 0, -1)}
+    assert queued == indexed == pending
+    # Индекс по времени создания (после миграции он перестраивается при первом чтении) содержит все задачи
+    page, next_cursor = queue.list_tasks_page(limit=100)
+    assert next_cursor is None
+    assert sorted(task["task_id"] for task in page) == sorted(task["task_id"] for task in tasks)
+    assert len(tasks) == live["total_tasks"]
+    executing = {task_id.decode() for task_id in queue.redis.zrange(queue_module.EXECUTING_INDEX_KEY, 0, -1)}
+    assert executing == {task["task_id"] for task in tasks if task["status"] == "executing"}
+
+
+def test_stats_and_indexes_consistent(queue):
+    ids = [queue.add_task("user", "training", {}) for _ in range(5)]
+    for task_id in ids[:3]:
+        queue.claim_next_task(timeout=0)
+        queue.start_task(task_id)
+        queue.mark_started(task_id)
+    queue.complete_task(ids[0], {})
+    queue.fail_task(ids[1], "boom")
+    queue.retry_task(ids[1])
+
+    assert_stats_consistent(queue)
+
+
+def test_stats_and_indexes_consistent_with_legacy_keys(queue, legacy_tasks):
+    # Ключи старого формата преобразуются при запуске приложения (initialize)
+    queue.ensure_legacy_migrated()
+    new_id = queue.add_task("user", "training", {})
+    # Задача старого формата проходит повторную попытку наравне с новыми
+    assert queue.retry_task("old2")
+    assert queue.claim_next_task(timeout=0) == new_id
+    queue.start_task(new_id)
+    queue.complete_task(new_id, {})
+
+    assert_stats_consistent(queue)
+    assert queue.get_task("old2")["status"] == "pending"
@@ -0,0 +1,79 @@
+"""
+Tests for the seasonal decomposition and anomaly detection of TimeSeriesAnalyzer
+"""
+import pytest
+import numpy as np
+import pandas as pd
+from app.services.analysis.time_series_analysis import TimeSeriesAnalyzer, _decompose
+
+
+def seasonal_series(n=100, period=7):
+    # Фиксированный ряд: тренд, сезонность и шум с фиксированным seed
+    rng = np.random.default_rng(0)
+    t = np.arange(n)
+    return 0.1 * t + 5 * np.sin(2 * np.pi * t / period) + rng.normal(0, 1, n)
+
+
+@pytest.mark.parametrize("n, period", [(100, 7), (48, 12), (30, 4)])
+def test_decompose_matches_statsmodels(n, period):
+    seasonal_decompose = pytest.importorskip("statsmodels.tsa.seasonal").seasonal_decompose
+    y = seasonal_series(n, period)
+
+    result = _decompose(y, period)
+    expected = seasonal_decompose(y, model="additive", period=period, extrapolate_trend="freq")
+
+    np.testing.assert_allclose(result.trend, expected.trend, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(result.seasonal, expected.seasonal, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(result.resid, expected.resid, rtol=0, atol=1e-12)
+
+
+def test_decompose_rejects_missing_values():
+    y = seasonal_series()
+    y[10] = np.nan
+
+    with pytest.raises(ValueError):
+        _decompose(y, 7)
+
+
+def anomaly_frame():
+    values = np.array([10.0, 11.0, 9.0, 10.0, 12.0, 10.0, 50.0, 10.0, 9.0, -20.0, 11.0, np.nan])
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=len(values), freq='D'), 'value': values})
+
+
+def test_detect_anomalies_modified_zscore():
+    df = anomaly_frame()
+    values = df['value'].to_numpy()
+    median = np.nanmedian(values)
+    mad = np.nanmedian(np.abs(values - median))
+
+    anomalies = TimeSeriesAnalyzer(df, 'date', 'value').detect_anomalies(threshold=3.5)
+
+    # Выбросы определяются по медиане и MAD, пропуск аномалией не считается
+    assert [a['date'] for a in anomalies] == ['2024-01-07T00:00:00', '2024-01-10T00:00:00']
+    assert [a['type'] for a in anomalies] == ['high', 'low']
+    assert anomalies[0]['zscore'] == pytest.approx(0.6745 * (50.0 - median) / mad)
+
+
+def test_detect_anomalies_zscore_method():
+    # Обычная Z-оценка завышена выбросами в стандартном отклонении: слабый выброс не находится
+    df = anomaly_frame()
+
+    anomalies = TimeSeriesAnalyzer(df, 'date', 'value').detect_anomalies(threshold=2.5, method="zscore")
+
+    assert [a['value'] for a in anomalies] == [50.0]
+
+
+def test_detect_anomalies_constant_majority():
+    # MAD = 0 (больше половины значений совпадают): используется обычная Z-оценка
+    values = [5.0] * 9 + [100.0]
+    df = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=10, freq='D'), 'value': values})
+
+    anomalies = TimeSeriesAnalyzer(df, 'date', 'value').detect_anomalies(threshold=2.5)
+
+    assert [a['value'] for a in anomalies] == [100.0]
+    assert anomalies[0]['type'] == 'high'
+
+
+def test_detect_anomalies_unknown_method():
+    with pytest.raises(ValueError):
+        TimeSeriesAnalyzer(anomaly_frame(), 'date', 'value').detect_anomalies(method="iqr")
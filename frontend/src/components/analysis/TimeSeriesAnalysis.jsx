@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { Card, Tabs, Space, Typography, Table, Statistic, Row, Col } from 'antd';
 import { LineChartOutlined, WarningOutlined, AreaChartOutlined } from '@ant-design/icons';
 import TimeSeriesChart from '../charts/TimeSeriesChart';
@@ -25,6 +25,18 @@ const TimeSeriesAnalysis = ({
         { title: 'Количество пропусков', value: statistics?.missing_values, precision: 0 }
     ];
 
+    // Компоненты декомпозиции приходят по столбцам; графику нужны записи
+    const componentRecords = useMemo(() => {
+        const components = seasonality?.components;
+        if (!components) return null;
+        return components.date.map((date, i) => ({
+            date,
+            trend: components.trend[i],
+            seasonal: components.seasonal[i],
+            residual: components.residual[i]
+        }));
+    }, [seasonality]);
+
     // Форматируем данные об аномалиях для таблицы
     const anomalyColumns = [
         {
@@ -149,10 +161,10 @@ const TimeSeriesAnalysis = ({
                                     </Row>
                                 </Card>
 
-                                {seasonality.components && (
+                                {componentRecords && (
                                     <Card title="Декомпозиция временного ряда">
                                         <TimeSeriesChart
-                                            data={seasonality.components}
+                                            data={componentRecords}
                                             dateColumn="date"
                                             valueColumn="seasonal"
                                             title="Сезонная компонента"
@@ -1,5 +1,5 @@
-import { useState, useEffect } from 'react';
-import { useQuery, useQueryClient } from 'react-query';
+import { useState, useEffect, useMemo } from 'react';
+import { useQuery, useInfiniteQuery, useQueryClient } from 'react-query';
 import { queueService } from '../services/api';
 
 // Хук для периодического опроса статуса задачи с расширенной информацией о прогрессе
@@ -88,19 +88,41 @@ export const useTaskStatus = (taskId, onComplete, onFail, onProgress) => {
 
 // Хук для периодического опроса информации об очереди
 export const useQueueInfo = () => {
-  const { data, error, isLoading, refetch } = useQuery(
+  const {
+    data,
+    error,
+    isLoading,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery(
     'queueInfo',
-    queueService.getQueueInfo,
+    // Курсор передаем явно: react-query передает в функцию объект контекста запроса
+    ({ pageParam = null }) => queueService.getQueueInfo(pageParam),
     {
-      refetchInterval: 5000, // Обновляем каждые 5 секунд
+      getNextPageParam: (lastPage) => lastPage.next_cursor || undefined,
+      refetchInterval: 5000, // Обновляем каждые 5 секунд (все загруженные страницы)
     }
   );
 
+  // Статистика берется из первой страницы, задачи - из всех загруженных страниц
+  const queueInfo = useMemo(() => {
+    if (!data?.pages?.length) return undefined;
+    return {
+      ...data.pages[0],
+      tasks: data.pages.flatMap((page) => page.tasks),
+    };
+  }, [data]);
+
   return { 
-    queueInfo: data, 
+    queueInfo, 
     error, 
     isLoading, 
-    refetch 
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
   };
 };
 
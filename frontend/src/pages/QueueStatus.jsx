@@ -28,7 +28,15 @@ const { Panel } = Collapse;
 const { TabPane } = Tabs;
 
 const QueueStatus = () => {
-  const { queueInfo, error, isLoading, refetch } = useQueueInfo();
+  const {
+    queueInfo,
+    error,
+    isLoading,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useQueueInfo();
   const [selectedTask, setSelectedTask] = useState(null);
   const [modalVisible, setModalVisible] = useState(false);
   const [logModalVisible, setLogModalVisible] = useState(false);
@@ -432,6 +440,17 @@ const QueueStatus = () => {
               {renderFailedTasks()}
             </TabPane>
           </Tabs>
+          {/* Сервер отдает задачи страницами (сначала новые), списки во вкладках строятся по загруженным страницам */}
+          {hasNextPage && (
+            <div style={{ textAlign: 'center', marginTop: 16 }}>
+              <Text type="secondary" style={{ marginRight: 8 }}>
+                Загружено задач: {queueInfo?.tasks.length || 0} из {queueInfo?.total_tasks || 0}
+              </Text>
+              <Button onClick={() => fetchNextPage()} loading={isFetchingNextPage}>
+                Загрузить еще
+              </Button>
+            </div>
+          )}
         </Card>
       </Space>
 
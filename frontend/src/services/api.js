@@ -194,8 +194,10 @@ export const queueService = {
   },
   
   // Получение информации об очереди
-  getQueueInfo: async () => {
-    const response = await api.get('/queue/info');
+  getQueueInfo: async (cursor = null, limit = 50) => {
+    const response = await api.get('/queue/info', {
+      params: { cursor, limit }
+    });
     return response.data;
   },
   